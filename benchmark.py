@@ -0,0 +1,470 @@
+# Throughput benchmark for fullparser.py
+# Generates one synthetic LPMT file per layout and times detection, streaming
+# decode, columnar decode and the full text report on each, in a fresh process
+# per layout so peak RSS is per layout too. Results go out as JSON for
+# regression comparison:
+#   python benchmark.py --entries 20000 --json base.json
+#   python benchmark.py --entries 20000 --compare base.json
+import struct, argparse
+import math
+import os, sys
+import json, time, random, fnmatch, tempfile, platform
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import fullparser
+
+BENCH_ENTRIES = 10000
+BENCH_REPEAT = 3
+BENCH_TOLERANCE = 0.10
+
+def random_transform(rng):
+    # uniform scale keeps every matrix layout's column norms equal to it
+    pos = [rng.uniform(-100, 100) for _ in range(3)]
+    roll, pitch, yaw = rng.uniform(-math.pi, math.pi), rng.uniform(-1.5, 1.5), rng.uniform(-math.pi, math.pi)
+    cy, sy = math.cos(yaw * 0.5), math.sin(yaw * 0.5)
+    cp, sp = math.cos(pitch * 0.5), math.sin(pitch * 0.5)
+    cr, sr = math.cos(roll * 0.5), math.sin(roll * 0.5)
+    quat = [
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+        cr * cp * cy + sr * sp * sy
+    ]
+    if quat[3] < 0:
+        quat = [-q for q in quat]
+    s = rng.uniform(0.5, 2.0)
+    return pos, [s, s, s], quat, [roll, pitch, yaw]
+
+def rotation_matrix(q):
+    x, y, z, w = q
+    return [
+        [1 - 2*(y*y + z*z), 2*(x*y - z*w), 2*(x*z + y*w)],
+        [2*(x*y + z*w), 1 - 2*(x*x + z*z), 2*(y*z - x*w)],
+        [2*(x*z - y*w), 2*(y*z + x*w), 1 - 2*(x*x + y*y)],
+    ]
+
+# Body encoders, the inverse of fullparser's decode_* for a uniform scale
+def encode_mat4x4(pos, scale, quat, transposed):
+    r, s = rotation_matrix(quat), scale[0]
+    v = [0.0] * 16
+    for i in range(3):
+        for j in range(3):
+            if transposed:
+                v[j*4+i] = r[i][j] * s
+            else:
+                v[i*4+j] = r[i][j] * s
+    if transposed:
+        v[3], v[7], v[11] = pos
+    else:
+        v[12], v[13], v[14] = pos
+    v[15] = 1.0
+    return v
+
+def encode_mat3x4(pos, scale, quat, transposed):
+    r, s = rotation_matrix(quat), scale[0]
+    if transposed:
+        return [r[0][0]*s, r[0][1]*s, r[0][2]*s, pos[0],
+                r[1][0]*s, r[1][1]*s, r[1][2]*s, pos[1],
+                r[2][0]*s, r[2][1]*s, r[2][2]*s, pos[2]]
+    return [r[i][j] * s for i in range(3) for j in range(3)] + list(pos)
+
+def encode_mat3x3(pos, scale, quat, transposed):
+    r = rotation_matrix(quat)
+    rot = [r[j][i] if transposed else r[i][j] for i in range(3) for j in range(3)]
+    return rot + list(pos) + list(scale)
+
+def encode_spec(spec, transform, index):
+    # declarative layouts: prefix values carry the entry index (bytes wrap
+    # below 'A' so four of them never spell a tag), pad bytes fill up to the
+    # stride
+    prefix, body, transposed, stride = spec
+    pos, scale, quat = transform[:3]
+    body_fmt, decoders, fields = fullparser.BODIES[body]
+    if decoders:
+        values = {'mat4x4': encode_mat4x4, 'mat3x4': encode_mat3x4, 'mat3x3': encode_mat3x3}[body](pos, scale, quat, transposed)
+    else:
+        p, q, s = fields
+        values = [0.0] * 10
+        values[p:p+3], values[q:q+4], values[s:s+3] = pos, quat, scale
+    limits = {'B': 0x3F, 'H': 0xFFFF, 'I': 0xFFFFFFFF}
+    head = [index & limits[c] for c in prefix]
+    packed = struct.pack('<' + prefix + body_fmt, *head, *values)
+    return packed + b'\0' * (stride - len(packed))
+
+def encode_euler_angles(pos, scale, quat, euler, index):
+    return struct.pack('<9f', *pos, *euler, *scale)
+
+def encode_axis_angle(pos, scale, quat, euler, index):
+    angle = 2 * math.acos(max(-1.0, min(1.0, quat[3])))
+    s = math.sin(angle * 0.5)
+    axis = [q / s for q in quat[:3]] if s > 1e-6 else [1.0, 0.0, 0.0]
+    return struct.pack('<10f', *pos, *axis, angle, *scale)
+
+def encode_dual_quaternion(pos, scale, quat, euler, index):
+    # dual part = 0.5 * (pos, 0) * quat
+    tx, ty, tz = pos
+    x, y, z, w = quat
+    dual = [
+        0.5 * (tx*w + ty*z - tz*y),
+        0.5 * (ty*w + tz*x - tx*z),
+        0.5 * (tz*w + tx*y - ty*x),
+        -0.5 * (tx*x + ty*y + tz*z),
+    ]
+    return struct.pack('<11f', *quat, *dual, *scale)
+
+def encode_compact_quat(pos, scale, quat, euler, index):
+    return struct.pack('<9f', *pos, *quat[:3], *scale)
+
+def encode_var_header(body_fmt, values):
+    # odd header size so the entry doesn't also read as an int-prefixed layout
+    return struct.pack(f'<3B{body_fmt}', 1, 2, 3, *values)
+
+def encode_var_header_16f(pos, scale, quat, euler, index):
+    return encode_var_header('16f', encode_mat4x4(pos, scale, quat, False))
+
+def encode_var_header_12f(pos, scale, quat, euler, index):
+    return encode_var_header('12f', encode_mat3x4(pos, scale, quat, True))
+
+def encode_var_header_10f(pos, scale, quat, euler, index):
+    return encode_var_header('10f', pos + quat + scale)
+
+def encode_inverted_4x4(pos, scale, quat, euler, index):
+    r, s = rotation_matrix(quat), scale[0]
+    v = [0.0] * 16
+    for i in range(3):
+        for j in range(3):
+            v[i*4+j] = r[i][j] / s
+    v[12], v[13], v[14] = [-p for p in pos]
+    v[15] = 1.0
+    return struct.pack('<16f', *v)
+
+def encode_decomposed_trans(pos, scale, quat, euler, index):
+    offset = [1.0, 2.0, 3.0]
+    return struct.pack('<3f4f3f3f', *[p - o for p, o in zip(pos, offset)], *quat, *scale, *offset)
+
+def encode_trs_with_pivot(pos, scale, quat, euler, index):
+    return struct.pack('<3f4f3f3f', 0.0, 0.0, 0.0, *quat, *scale, *pos)
+
+def encode_half_precision(pos, scale, quat, euler, index):
+    return struct.pack('<20e', *pos, *quat, *scale, *([0.0] * 10))
+
+def encode_compressed_quat(pos, scale, quat, euler, index):
+    packed = [round((q + 1.0) * 0.5 * 2147483647) for q in quat[:3]]
+    return struct.pack('<3f3I3f', *pos, *packed, *scale)
+
+def encode_nested_structure(pos, scale, quat, euler, index):
+    return struct.pack('<I3fI4fI3f', 1, *pos, 2, *quat, 3, *scale)
+
+def encode_string_prefixed(pos, scale, quat, euler, index):
+    name = f'node_{index}'.encode()
+    return struct.pack('<I', len(name)) + name + struct.pack('<16f', *encode_mat4x4(pos, scale, quat, False))
+
+def encode_bitpacked(pos, scale, quat, euler, index):
+    # 10 bits per position axis (-50..52.3, so pos is halved), 10 bits of
+    # yaw, 8 bits of scale
+    bits = [max(0, min(1023, round((p / 2 + 50.0) * 10.0))) for p in pos]
+    angle = euler[2] % (2 * math.pi)
+    rot_bits = round(angle / (2 * math.pi) * 1023.0)
+    scale_bits = max(0, min(255, round((scale[0] - 0.5) / 2.0 * 255.0)))
+    return struct.pack('<Q', bits[0] | bits[1] << 10 | bits[2] << 20 | rot_bits << 30 | scale_bits << 40)
+
+def spread_bits(v):
+    v &= 0xFF
+    v = (v | v << 8) & 0x00F00F
+    v = (v | v << 4) & 0x0C30C3
+    v = (v | v << 2) & 0x249249
+    return v
+
+def encode_morton_encoded(pos, scale, quat, euler, index):
+    # try_parse_morton_encoded's compaction only keeps the low 8 bits of each
+    # axis intact, so |pos| is scaled into 0..255 thousandths
+    x, y, z = [round(abs(p) / 100.0 * 255.0) for p in pos]
+    morton = spread_bits(x) | spread_bits(y) << 1 | spread_bits(z) << 2
+    return struct.pack('<Q4f3f', morton, *quat, *scale)
+
+def quat_i16(quat):
+    return [round(q * 32767.0) for q in quat]
+
+def encode_quat4h(pos, scale, quat, euler, index):
+    return struct.pack('<3f4h3f', *pos, *quat_i16(quat), *scale)
+
+def encode_quat4H(pos, scale, quat, euler, index):
+    return struct.pack('<3f4H3f', *pos, *[round((q + 1.0) * 0.5 * 65535.0) for q in quat], *scale)
+
+def encode_fixed_i32_i16(pos, scale, quat, euler, index):
+    # the first denominators try_parse_fixed_pos_i32_quat_i16_scale_i16 tries
+    return struct.pack('<3i4h3h', *[round(p * 1000.0) for p in pos], *quat_i16(quat),
+                       *[round(s * 100.0) for s in scale])
+
+def encode_fixed_all_i16(pos, scale, quat, euler, index):
+    # the first denominators try_parse_fixed_all_i16 tries
+    return struct.pack('<3h4h3h', *[round(p * 10.0) for p in pos], *quat_i16(quat),
+                       *[round(s * 10.0) for s in scale])
+
+def encode_1int_3f_4h_3f(pos, scale, quat, euler, index):
+    return struct.pack('<I3f4h3f', index, *pos, *quat_i16(quat), *scale)
+
+def encode_2int_3f_4h_3f(pos, scale, quat, euler, index):
+    return struct.pack('<II3f4h3f', index, 0, *pos, *quat_i16(quat), *scale)
+
+# layout name -> encoder for the hand-written try_parse_* layouts; the
+# declarative ones are encoded from their LAYOUTS spec
+ENCODERS = {
+    "euler_angles": encode_euler_angles,
+    "axis_angle": encode_axis_angle,
+    "dual_quaternion": encode_dual_quaternion,
+    "compact_quat": encode_compact_quat,
+    "var_header+16f": encode_var_header_16f,
+    "var_header+12f": encode_var_header_12f,
+    "var_header+10f": encode_var_header_10f,
+    "inverted_4x4": encode_inverted_4x4,
+    "decomposed_trans": encode_decomposed_trans,
+    "trs_with_pivot": encode_trs_with_pivot,
+    "half_precision": encode_half_precision,
+    "compressed_quat": encode_compressed_quat,
+    "nested_structure": encode_nested_structure,
+    "string_prefixed": encode_string_prefixed,
+    "bitpacked": encode_bitpacked,
+    "morton_encoded": encode_morton_encoded,
+    "pos+quat4h+scale": encode_quat4h,
+    "pos+quat4H+scale": encode_quat4H,
+    "fixed_i32+i16": encode_fixed_i32_i16,
+    "fixed_all_i16": encode_fixed_all_i16,
+    "1int+3f+4h+3f": encode_1int_3f_4h_3f,
+    "2int+3f+4h+3f": encode_2int_3f_4h_3f,
+}
+
+# Synthetic files the scorer can't tell from an earlier layout in detection
+# order: every entry decodes as a valid transform both ways, so detection
+# keeps the earlier one
+KNOWN_AMBIGUOUS = {
+    "transposed_4x4": "4x4_matrix",              # translation column reads as a zero row
+    "compact_quat": "euler_angles",              # any 9 floats are valid euler angles
+    "col_3x3+pos+scale": "row_3x3+pos+scale",    # a transposed rotation is a rotation too
+    "inverted_4x4": "4x4_matrix",                # so is the inverse of rotation * scale
+    "trs_with_pivot": "decomposed_trans",        # the zero pivot reads as a zero offset
+}
+
+def layout_alias(a, b):
+    # declarative layouts with the same prefix size, body, orientation and
+    # stride decode any bytes identically
+    specs = dict(fullparser.LAYOUTS)
+    sa, sb = specs[a], specs[b]
+    if callable(sa) or callable(sb):
+        return a == b
+    return (struct.calcsize('<' + sa[0]),) + sa[1:] == (struct.calcsize('<' + sb[0]),) + sb[1:]
+
+def detection_status(layout, detected):
+    # 'ok', 'alias', 'ambiguous' (KNOWN_AMBIGUOUS) or 'misdetected'
+    if detected == layout:
+        return 'ok'
+    if detected is not None and layout_alias(layout, detected):
+        return 'alias'
+    if KNOWN_AMBIGUOUS.get(layout) == detected:
+        return 'ambiguous'
+    return 'misdetected'
+
+def encode_entry(layout, transform, index):
+    spec = dict(fullparser.LAYOUTS)[layout]
+    if callable(spec):
+        return ENCODERS[layout](*transform, index)
+    return encode_spec(spec, transform, index)
+
+def generate_lpmt(layout, entries, blocks=1, seed=1):
+    # file header, then `blocks` LPMT blocks of `entries` entries each, each
+    # closed by a FourCC tag the way real files follow LPMT with other chunks
+    rng = random.Random(seed)
+    out = bytearray(b'HEAD' + struct.pack('<I', 8) + b'\0' * 8)
+    for _ in range(blocks):
+        out += b'LPMT' + struct.pack('<I', entries)
+        for i in range(entries):
+            # an entry starting with four uppercase bytes ends the block for
+            # the decoder, so redraw those to keep every file `entries` long
+            entry = encode_entry(layout, random_transform(rng), i)
+            while fullparser.is_fourcc(entry, 0):
+                entry = encode_entry(layout, random_transform(rng), i)
+            out += entry
+        out += b'NEXT' + struct.pack('<I', 16) + b'\0' * 16
+    return bytes(out)
+
+def write_lpmt(path, layout, entries, blocks=1, seed=1):
+    data = generate_lpmt(layout, entries, blocks, seed)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+def best_time(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def rates(seconds, entries, size):
+    return {
+        'seconds': seconds,
+        'entries_per_s': entries / seconds if seconds else None,
+        'mb_per_s': size / seconds / 1e6 if seconds else None,
+    }
+
+def bench_file(path, layout, repeat=BENCH_REPEAT, report=True):
+    # runs in its own process; no layout cache, so every pass re-detects
+    data = fullparser.map_file(path)
+    try:
+        block = fullparser.find_lpmt_blocks(data)[0]
+        with memoryview(data)[:block.end] as view:
+            detect_s, detected = best_time(lambda: fullparser.detect_block_layout(
+                view, block.offset, stride=fullparser.header_stride(view, block.offset)), repeat)
+    finally:
+        data.close()
+    size = block.end - block.offset
+    decode_s, decoded = best_time(lambda: sum(1 for _ in fullparser.iter_lpmt_entries(path)), repeat)
+    table_s, table = best_time(lambda: fullparser.read_lpmt_table(path), repeat)
+    result = {
+        'layout': layout,
+        'detected': detected[0] if detected else None,
+        'detection': detection_status(layout, detected[0] if detected else None),
+        'entries': block.entry_count,
+        'decoded': decoded,
+        'valid': sum(table.valid),
+        'bytes': size,
+        'detect_s': detect_s,
+        'decode': rates(decode_s, decoded, size),
+        'table': rates(table_s, len(table), size),
+    }
+    if report:
+        def run_report():
+            with open(os.devnull, 'w') as null, redirect_stdout(null):
+                fullparser.parse_lpmt_block(path)
+        result['report'] = rates(best_time(run_report, repeat)[0], decoded, size)
+    result['peak_rss_kb'] = peak_rss_kb()
+    return result
+
+def select_layouts(patterns=None):
+    names = [name for name, _ in fullparser.LAYOUTS]
+    if not patterns:
+        return names
+    return [name for name in names if any(fnmatch.fnmatchcase(name, p) for p in patterns)]
+
+def run_benchmark(layouts, entries=BENCH_ENTRIES, repeat=BENCH_REPEAT, report=True, workdir=None):
+    # files are generated up front so generation never shows up in a
+    # worker's timings or RSS; one task per worker process
+    paths = []
+    for i, layout in enumerate(layouts):
+        path = os.path.join(workdir, f'{i:02d}.map')
+        write_lpmt(path, layout, entries)
+        paths.append(path)
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx, max_tasks_per_child=1) as pool:
+        results = list(pool.map(bench_file, paths, layouts, [repeat] * len(paths), [report] * len(paths)))
+    total_s = sum(r['decode']['seconds'] for r in results)
+    total_entries = sum(r['decoded'] for r in results)
+    total_bytes = sum(r['bytes'] for r in results)
+    return {
+        'version': 1,
+        'python': platform.python_version(),
+        'numpy': fullparser.np.__version__ if fullparser.np is not None else None,
+        'platform': platform.platform(),
+        'entries': entries,
+        'repeat': repeat,
+        'results': results,
+        'total': rates(total_s, total_entries, total_bytes),
+    }
+
+def print_results(run):
+    # detection other than the generated layout is marked: '=' alias,
+    # '~' known ambiguity, '!' misdetected
+    marks = {'ok': ' ', 'alias': '=', 'ambiguous': '~', 'misdetected': '!'}
+    print(f"{'layout':<20}   {'detected':<20} {'decoded':>8} {'decode/s':>11} {'MB/s':>8} {'table/s':>11} {'report/s':>10} {'RSS MB':>7}")
+    for r in run['results']:
+        report = r.get('report')
+        rss = f"{r['peak_rss_kb'] / 1024:.1f}" if r['peak_rss_kb'] is not None else '-'
+        print(f"{r['layout']:<20} {marks[r['detection']]} {str(r['detected']):<20} {r['decoded']:>8} "
+              f"{r['decode']['entries_per_s']:>11.0f} {r['decode']['mb_per_s']:>8.2f} "
+              f"{r['table']['entries_per_s']:>11.0f} "
+              f"{report['entries_per_s'] if report else 0:>10.0f} {rss:>7}")
+    total = run['total']
+    print(f"Total: {total['entries_per_s']:.0f} entries/s, {total['mb_per_s']:.2f} MB/s over {len(run['results'])} layouts")
+
+def misdetections(run):
+    # layouts detected as something that is neither an alias nor a known
+    # ambiguity: their throughput numbers measure the wrong decoder
+    bad = [r for r in run['results'] if r['detection'] == 'misdetected']
+    for r in bad:
+        print(f"MISDETECTED {r['layout']}: detected as {r['detected']}")
+    return bad
+
+def compare_results(run, baseline, tolerance=BENCH_TOLERANCE):
+    # regressions: decode or table rate below baseline by more than
+    # tolerance, or a layout now detected differently than in the baseline
+    if baseline.get('entries') != run['entries']:
+        print(f"Note: baseline used {baseline.get('entries')} entries per file, this run {run['entries']}")
+    old = {r['layout']: r for r in baseline['results']}
+    regressions = []
+    for r in run['results']:
+        base = old.get(r['layout'])
+        if base is None:
+            continue
+        if base.get('detected') != r['detected']:
+            regressions.append((r['layout'], 'detect', base.get('detected'), r['detected']))
+        for key in ('decode', 'table'):
+            before, after = base[key]['entries_per_s'], r[key]['entries_per_s']
+            if before and after is not None and after < before * (1 - tolerance):
+                regressions.append((r['layout'], key, before, after))
+    for layout, key, before, after in regressions:
+        if key == 'detect':
+            print(f"REGRESSION {layout} detection: {before} -> {after}")
+        else:
+            print(f"REGRESSION {layout} {key}: {before:.0f} -> {after:.0f} entries/s ({after / before - 1:+.1%})")
+    return regressions
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("layouts", nargs="*", help="layout names or patterns (default: every layout)")
+    ap.add_argument("-n", "--entries", type=int, default=BENCH_ENTRIES, help="entries per synthetic file")
+    ap.add_argument("--repeat", type=int, default=BENCH_REPEAT, help="timed passes per measurement, best is kept")
+    ap.add_argument("--no-report", action="store_true", help="skip the end-to-end text report timing")
+    ap.add_argument("--json", default=None, help="write results as JSON to this file ('-' for stdout)")
+    ap.add_argument("--compare", default=None, help="baseline JSON to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=BENCH_TOLERANCE, help="allowed slowdown before a regression is reported")
+    ap.add_argument("--keep", default=None, help="generate the synthetic files into this directory and keep them")
+    args = ap.parse_args()
+    layouts = select_layouts(args.layouts)
+    if not layouts:
+        print("No layouts matched")
+        sys.exit(1)
+    if args.keep:
+        os.makedirs(args.keep, exist_ok=True)
+        run = run_benchmark(layouts, args.entries, args.repeat, not args.no_report, args.keep)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            run = run_benchmark(layouts, args.entries, args.repeat, not args.no_report, workdir)
+    if args.json == '-':
+        json.dump(run, sys.stdout, indent=1)
+        print()
+    else:
+        print_results(run)
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump(run, f, indent=1)
+    failed = bool(misdetections(run))
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        failed = bool(compare_results(run, baseline, args.tolerance)) or failed
+    sys.exit(1 if failed else 0)
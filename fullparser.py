@@ -3,6 +3,62 @@
 import struct, argparse
 import math
 import os, sys
+import mmap
+import glob, fnmatch, io
+import json, hashlib, tempfile, shutil, zipfile
+import re, time, atexit
+import ctypes, select
+from bisect import bisect_left
+from contextlib import redirect_stdout, contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from array import array
+from collections import namedtuple
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+DETECT_SAMPLES = 16
+# detection score (per entry, out of 3) above which a layout counts as plausible
+PLAUSIBLE_SCORE = 2.0
+PARALLEL_MIN_ENTRIES = 65536
+FINGERPRINT_BYTES = 1024
+CACHE_MAX_ENTRIES = 4096
+SCHEDULE_DECAY = 0.9
+VAR_HEADER_SIZES = [1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 28, 32]
+# float32 exponent fields accepted by the prefilter, about 1e-18 .. 1e12;
+# zero, denormals, nan/inf and anything far outside transform ranges fail
+PLAUSIBLE_EXP = (67, 167)
+PREFILTER_WINDOW = 65536
+PREFILTER_CAP = 64
+EXPORT_CHUNK = 65536
+INCREMENTAL_CHUNK = 4096
+COLUMNS_MAGIC = b'LPMTCOL1'
+COLUMNS_ALIGN = 64
+TEXT_BUFFER = 1 << 20
+DIFF_EPSILON = 1e-4
+DIFF_ROT_TOL = 0.01
+DIFF_RADIUS = 1.0
+DIFF_CELL_TARGET = 2
+DIFF_PAIR_CAP = 1 << 22
+DIFF_MUTUAL_ROUNDS = 8
+WATCH_INTERVAL = 1.0
+WATCH_DEBOUNCE = 0.5
+
+# ParserStats while --stats instrumentation is on
+INSTRUMENT = None
+
+LpmtEntry = namedtuple('LpmtEntry', 'offset layout pos scale quat valid size')
+LpmtBlock = namedtuple('LpmtBlock', 'offset entry_count end')
     
 def quaternion_from_matrix(m):
     if len(m) == 9:
@@ -67,394 +123,127 @@ def validate_transform(pos, scale, quat):
     except:
         return False
 
-def try_parse_4x4_matrix(data, offset):
-    try:
-        values = struct.unpack_from('<16f', data, offset)
-        pos = [values[12], values[13], values[14]]
-        scale = [
-            math.sqrt(values[0]**2 + values[4]**2 + values[8]**2),
-            math.sqrt(values[1]**2 + values[5]**2 + values[9]**2),
-            math.sqrt(values[2]**2 + values[6]**2 + values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 64
-    except:
-        return None
-
-def try_parse_3x4_matrix(data, offset):
-    try:
-        values = struct.unpack_from('<12f', data, offset)
-        pos = [values[9], values[10], values[11]]
-        scale = [
-            math.sqrt(values[0]**2 + values[3]**2 + values[6]**2),
-            math.sqrt(values[1]**2 + values[4]**2 + values[7]**2),
-            math.sqrt(values[2]**2 + values[5]**2 + values[8]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(values[i*3+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 48
-    except:
-        return None
-
-def try_parse_pos_quat_scale(data, offset):
-    try:
-        values = struct.unpack_from('<10f', data, offset)
-        pos = list(values[0:3])
-        quat = list(values[3:7])
-        scale = list(values[7:10])
-        return pos, scale, quat, 40
-    except:
-        return None
-
-def try_parse_quat_pos_scale(data, offset):
-    try:
-        values = struct.unpack_from('<10f', data, offset)
-        quat = list(values[0:4])
-        pos = list(values[4:7])
-        scale = list(values[7:10])
-        return pos, scale, quat, 40
-    except:
-        return None
-
-def try_parse_scale_pos_quat(data, offset):
-    try:
-        values = struct.unpack_from('<10f', data, offset)
-        scale = list(values[0:3])
-        pos = list(values[3:6])
-        quat = list(values[6:10])
-        return pos, scale, quat, 40
-    except:
-        return None
-
-def try_parse_1int_16f(data, offset):
-    try:
-        values = struct.unpack_from('<I16f', data, offset)
-        matrix_values = values[1:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 68
-    except:
-        return None
-
-def try_parse_2int_16f(data, offset):
-    try:
-        values = struct.unpack_from('<II16f', data, offset)
-        matrix_values = values[2:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 72
-    except:
-        return None
-
-def try_parse_1int_12f(data, offset):
-    try:
-        values = struct.unpack_from('<I12f', data, offset)
-        matrix_values = values[1:]
-        pos = [matrix_values[9], matrix_values[10], matrix_values[11]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[3]**2 + matrix_values[6]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[4]**2 + matrix_values[7]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[5]**2 + matrix_values[8]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*3+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 52
-    except:
-        return None
-
-def try_parse_2int_12f(data, offset):
-    try:
-        values = struct.unpack_from('<II12f', data, offset)
-        matrix_values = values[2:]
-        pos = [matrix_values[9], matrix_values[10], matrix_values[11]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[3]**2 + matrix_values[6]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[4]**2 + matrix_values[7]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[5]**2 + matrix_values[8]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*3+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 56
-    except:
-        return None
-
-def try_parse_4byte_pad_16f(data, offset):
-    try:
-        values = struct.unpack_from('<I16f', data, offset)
-        matrix_values = values[1:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 68
-    except:
-        return None
-
-def try_parse_8byte_pad_12f(data, offset):
-    try:
-        values = struct.unpack_from('<II12f', data, offset)
-        matrix_values = values[2:]
-        pos = [matrix_values[9], matrix_values[10], matrix_values[11]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[3]**2 + matrix_values[6]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[4]**2 + matrix_values[7]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[5]**2 + matrix_values[8]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*3+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 56
-    except:
-        return None
-
-def try_parse_1short_16f(data, offset):
-    try:
-        values = struct.unpack_from('<H16f', data, offset)
-        matrix_values = values[1:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 66
-    except:
-        return None
+def quaternion_from_matrix_bulk(rot):
+    # rot is (N, 9) row-major, same branch order as quaternion_from_matrix
+    m11, m12, m13 = rot[:, 0], rot[:, 1], rot[:, 2]
+    m21, m22, m23 = rot[:, 3], rot[:, 4], rot[:, 5]
+    m31, m32, m33 = rot[:, 6], rot[:, 7], rot[:, 8]
+    trace = m11 + m22 + m33
+    b0 = trace > 0
+    b1 = ~b0 & (m11 > m22) & (m11 > m33)
+    b2 = ~b0 & ~b1 & (m22 > m33)
+    b3 = ~(b0 | b1 | b2)
 
-def try_parse_2short_16f(data, offset):
-    try:
-        values = struct.unpack_from('<HH16f', data, offset)
-        matrix_values = values[2:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 68
-    except:
-        return None
+    quat = np.zeros((len(rot), 4))
+    with np.errstate(all='ignore'):
+        s = 0.5 / np.sqrt(trace[b0] + 1.0)
+        quat[b0] = np.stack([(m32[b0] - m23[b0]) * s, (m13[b0] - m31[b0]) * s,
+                             (m21[b0] - m12[b0]) * s, 0.25 / s], axis=1)
+        s = 2.0 * np.sqrt(1.0 + m11[b1] - m22[b1] - m33[b1])
+        quat[b1] = np.stack([0.25 * s, (m12[b1] + m21[b1]) / s,
+                             (m13[b1] + m31[b1]) / s, (m32[b1] - m23[b1]) / s], axis=1)
+        s = 2.0 * np.sqrt(1.0 + m22[b2] - m11[b2] - m33[b2])
+        quat[b2] = np.stack([(m12[b2] + m21[b2]) / s, 0.25 * s,
+                             (m23[b2] + m32[b2]) / s, (m13[b2] - m31[b2]) / s], axis=1)
+        s = 2.0 * np.sqrt(1.0 + m33[b3] - m11[b3] - m22[b3])
+        quat[b3] = np.stack([(m13[b3] + m31[b3]) / s, (m23[b3] + m32[b3]) / s,
+                             0.25 * s, (m21[b3] - m12[b3]) / s], axis=1)
+    return quat
 
-def try_parse_1byte_16f(data, offset):
-    try:
-        values = struct.unpack_from('<B16f', data, offset)
-        matrix_values = values[1:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 65
-    except:
-        return None
+def validate_transform_bulk(pos, scale, quat):
+    with np.errstate(all='ignore'):
+        ok = np.isfinite(pos).all(axis=1) & (np.abs(pos) <= 1e6).all(axis=1)
+        ok &= np.isfinite(scale).all(axis=1) & ((scale > 0) & (scale <= 1000)).all(axis=1)
+        ok &= np.isfinite(quat).all(axis=1)
+        ok &= np.abs(np.sqrt((quat * quat).sum(axis=1)) - 1.0) <= 0.1
+    return ok
 
-def try_parse_4byte_16f(data, offset):
-    try:
-        values = struct.unpack_from('<BBBB16f', data, offset)
-        matrix_values = values[4:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 68
-    except:
-        return None
+# Body decoders for the declarative layouts in LAYOUTS. Each takes the body
+# values (prefix already stripped) and returns (pos, scale, quat).
+def decode_mat4x4(v):
+    scale = [
+        math.sqrt(v[0]**2 + v[4]**2 + v[8]**2),
+        math.sqrt(v[1]**2 + v[5]**2 + v[9]**2),
+        math.sqrt(v[2]**2 + v[6]**2 + v[10]**2)
+    ]
+    rot_matrix = [v[i*4+j] / scale[j] if scale[j] != 0 else 0 for i in range(3) for j in range(3)]
+    return [v[12], v[13], v[14]], scale, quaternion_from_matrix(rot_matrix)
 
-def try_parse_transposed_4x4(data, offset):
-    try:
-        values = struct.unpack_from('<16f', data, offset)
-        pos = [values[3], values[7], values[11]]
-        scale = [
-            math.sqrt(values[0]**2 + values[1]**2 + values[2]**2),
-            math.sqrt(values[4]**2 + values[5]**2 + values[6]**2),
-            math.sqrt(values[8]**2 + values[9]**2 + values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(values[j*4+i] / scale[i] if scale[i] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 64
-    except:
-        return None
+def decode_mat4x4_transposed(v):
+    scale = [
+        math.sqrt(v[0]**2 + v[1]**2 + v[2]**2),
+        math.sqrt(v[4]**2 + v[5]**2 + v[6]**2),
+        math.sqrt(v[8]**2 + v[9]**2 + v[10]**2)
+    ]
+    rot_matrix = [v[j*4+i] / scale[i] if scale[i] != 0 else 0 for i in range(3) for j in range(3)]
+    return [v[3], v[7], v[11]], scale, quaternion_from_matrix(rot_matrix)
 
-def try_parse_transposed_3x4(data, offset):
-    try:
-        values = struct.unpack_from('<12f', data, offset)
-        pos = [values[3], values[7], values[11]]
-        scale = [
-            math.sqrt(values[0]**2 + values[1]**2 + values[2]**2),
-            math.sqrt(values[4]**2 + values[5]**2 + values[6]**2),
-            math.sqrt(values[8]**2 + values[9]**2 + values[10]**2)
-        ]
-        rot_matrix = []
-        for col in range(3):
-            for row in range(3):
-                idx = col * 4 + row
-                rot_matrix.append(values[idx] / scale[row] if scale[row] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 48
-    except:
-        return None
+def decode_mat3x4(v):
+    scale = [
+        math.sqrt(v[0]**2 + v[3]**2 + v[6]**2),
+        math.sqrt(v[1]**2 + v[4]**2 + v[7]**2),
+        math.sqrt(v[2]**2 + v[5]**2 + v[8]**2)
+    ]
+    rot_matrix = [v[i*3+j] / scale[j] if scale[j] != 0 else 0 for i in range(3) for j in range(3)]
+    return [v[9], v[10], v[11]], scale, quaternion_from_matrix(rot_matrix)
 
-def try_parse_1int_10f(data, offset):
-    try:
-        values = struct.unpack_from('<I10f', data, offset)
-        pos = list(values[1:4])
-        quat = list(values[4:8])
-        scale = list(values[8:11])
-        return pos, scale, quat, 44
-    except:
-        return None
+def decode_mat3x4_transposed(v):
+    scale = [
+        math.sqrt(v[0]**2 + v[1]**2 + v[2]**2),
+        math.sqrt(v[4]**2 + v[5]**2 + v[6]**2),
+        math.sqrt(v[8]**2 + v[9]**2 + v[10]**2)
+    ]
+    rot_matrix = [v[col*4+row] / scale[row] if scale[row] != 0 else 0 for col in range(3) for row in range(3)]
+    return [v[3], v[7], v[11]], scale, quaternion_from_matrix(rot_matrix)
 
-def try_parse_2int_10f(data, offset):
-    try:
-        values = struct.unpack_from('<II10f', data, offset)
-        pos = list(values[2:5])
-        quat = list(values[5:9])
-        scale = list(values[9:12])
-        return pos, scale, quat, 48
-    except:
-        return None
+def decode_mat3x3(v):
+    return list(v[9:12]), list(v[12:15]), quaternion_from_matrix(v[0:9])
 
-def try_parse_16byte_pad_16f(data, offset):
-    try:
-        values = struct.unpack_from('<IIII16f', data, offset)
-        matrix_values = values[4:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 80
-    except:
-        return None
+def decode_mat3x3_transposed(v):
+    rot_matrix = [v[row*3+col] for col in range(3) for row in range(3)]
+    return list(v[9:12]), list(v[12:15]), quaternion_from_matrix(rot_matrix)
 
-def try_parse_12byte_pad_12f(data, offset):
-    try:
-        values = struct.unpack_from('<III12f', data, offset)
-        matrix_values = values[3:]
-        pos = [matrix_values[9], matrix_values[10], matrix_values[11]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[3]**2 + matrix_values[6]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[4]**2 + matrix_values[7]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[5]**2 + matrix_values[8]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*3+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 60
-    except:
-        return None
+# body name -> (struct format, decoder for (body, transposed), (pos, quat, scale) field starts)
+BODIES = {
+    'mat4x4': ('16f', {False: decode_mat4x4, True: decode_mat4x4_transposed}, None),
+    'mat3x4': ('12f', {False: decode_mat3x4, True: decode_mat3x4_transposed}, None),
+    'mat3x3': ('15f', {False: decode_mat3x3, True: decode_mat3x3_transposed}, None),
+    'pqs': ('10f', None, (0, 3, 7)),
+    'qps': ('10f', None, (4, 0, 7)),
+    'spq': ('10f', None, (3, 6, 0)),
+    'psq': ('10f', None, (0, 6, 3)),
+    'pqs_f64': ('10d', None, (0, 3, 7)),
+    'pqs_mixed': ('3d4f3f', None, (0, 3, 7)),
+}
 
-def try_parse_3int_16f(data, offset):
-    try:
-        values = struct.unpack_from('<III16f', data, offset)
-        matrix_values = values[3:]
-        pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 76
-    except:
-        return None
+def compile_layout(prefix, body, transposed, stride):
+    # One precompiled struct.Struct per layout and a closure that goes
+    # straight from bytes to the (pos, scale, quat, size) tuple the
+    # try_parse_* functions return. The prefix values are never used, so the
+    # prefix compiles to pad bytes and the body values come back unsliced.
+    body_fmt, decoders, fields = BODIES[body]
+    header = struct.calcsize('<' + prefix)
+    fmt = f'<{header}x{body_fmt}' if header else '<' + body_fmt
+    pad = stride - struct.calcsize(fmt)
+    unpack_from = struct.Struct(fmt + (f'{pad}x' if pad else '')).unpack_from
 
-def try_parse_4int_12f(data, offset):
-    try:
-        values = struct.unpack_from('<IIII12f', data, offset)
-        matrix_values = values[4:]
-        pos = [matrix_values[9], matrix_values[10], matrix_values[11]]
-        scale = [
-            math.sqrt(matrix_values[0]**2 + matrix_values[3]**2 + matrix_values[6]**2),
-            math.sqrt(matrix_values[1]**2 + matrix_values[4]**2 + matrix_values[7]**2),
-            math.sqrt(matrix_values[2]**2 + matrix_values[5]**2 + matrix_values[8]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(matrix_values[i*3+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 64
-    except:
-        return None
+    if decoders:
+        decode = decoders[transposed]
+        def parse(data, offset):
+            try:
+                pos, scale, quat = decode(unpack_from(data, offset))
+                return pos, scale, quat, stride
+            except:
+                return None
+    else:
+        p, q, s = fields
+        def parse(data, offset):
+            try:
+                v = unpack_from(data, offset)
+                return list(v[p:p+3]), list(v[s:s+3]), list(v[q:q+4]), stride
+            except:
+                return None
+    return parse
 
 def try_parse_euler_angles(data, offset):
     try:
@@ -531,107 +320,58 @@ def try_parse_compact_quat(data, offset):
     except:
         return None
 
-def try_parse_1int_3f_4f_3f(data, offset):
-    try:
-        values = struct.unpack_from('<I3f4f3f', data, offset)
-        pos = list(values[1:4])
-        quat = list(values[4:8])
-        scale = list(values[8:11])
-        return pos, scale, quat, 44
-    except:
-        return None
+# var_header bodies: float32s after a 1..32 byte header, which is skipped
+# rather than unpacked
+VAR_HEADER_16F = struct.Struct('<16f')
+VAR_HEADER_12F = struct.Struct('<12f')
+VAR_HEADER_10F = struct.Struct('<10f')
 
-def try_parse_2int_3f_4f_3f(data, offset):
-    try:
-        values = struct.unpack_from('<II3f4f3f', data, offset)
-        pos = list(values[2:5])
-        quat = list(values[5:9])
-        scale = list(values[9:12])
-        return pos, scale, quat, 48
-    except:
-        return None
+def parse_var_header_16f(data, offset, header_size):
+    matrix_values = VAR_HEADER_16F.unpack_from(data, offset + header_size)
+    pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
+    scale = [
+        math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
+        math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
+        math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
+    ]
+    rot_matrix = []
+    for i in range(3):
+        for j in range(3):
+            rot_matrix.append(matrix_values[i*4+j] / scale[j] if scale[j] != 0 else 0)
+    quat = quaternion_from_matrix(rot_matrix)
+    if validate_transform(pos, scale, quat):
+        return pos, scale, quat, header_size + 64
+    return None
+
+def parse_var_header_10f(data, offset, header_size):
+    values = VAR_HEADER_10F.unpack_from(data, offset + header_size)
+    pos = list(values[0:3])
+    quat = list(values[3:7])
+    scale = list(values[7:10])
+    if validate_transform(pos, scale, quat):
+        return pos, scale, quat, header_size + 40
+    return None
 
 def try_parse_variable_header_16f(data, offset):
-    for header_size in [1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 28, 32]:
+    for header_size in VAR_HEADER_SIZES:
         try:
-            values = struct.unpack_from(f'<{header_size}B16f', data, offset)
-            matrix_values = values[header_size:]
-            pos = [matrix_values[12], matrix_values[13], matrix_values[14]]
-            scale = [
-                math.sqrt(matrix_values[0]**2 + matrix_values[4]**2 + matrix_values[8]**2),
-                math.sqrt(matrix_values[1]**2 + matrix_values[5]**2 + matrix_values[9]**2),
-                math.sqrt(matrix_values[2]**2 + matrix_values[6]**2 + matrix_values[10]**2)
-            ]
-            rot_matrix = []
-            for i in range(3):
-                for j in range(3):
-                    rot_matrix.append(matrix_values[i*3+j] / scale[j] if scale[j] != 0 else 0)
-            quat = quaternion_from_matrix(rot_matrix)
-            if validate_transform(pos, scale, quat):
-                return pos, scale, quat, header_size + 48
+            result = parse_var_header_16f(data, offset, header_size)
+            if result:
+                return result
         except:
             continue
     return None
 
 def try_parse_variable_header_10f(data, offset):
-    for header_size in [1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 28, 32]:
+    for header_size in VAR_HEADER_SIZES:
         try:
-            values = struct.unpack_from(f'<{header_size}B10f', data, offset)
-            pos = list(values[header_size:header_size+3])
-            quat = list(values[header_size+3:header_size+7])
-            scale = list(values[header_size+7:header_size+10])
-            if validate_transform(pos, scale, quat):
-                return pos, scale, quat, header_size + 40
+            result = parse_var_header_10f(data, offset, header_size)
+            if result:
+                return result
         except:
             continue
     return None
 
-def try_parse_row_major_3x3_plus_pos_scale(data, offset):
-    try:
-        values = struct.unpack_from('<15f', data, offset)
-        rot_matrix = list(values[0:9])
-        pos = list(values[9:12])
-        scale = list(values[12:15])
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 60
-    except:
-        return None
-
-def try_parse_col_major_3x3_plus_pos_scale(data, offset):
-    try:
-        values = struct.unpack_from('<15f', data, offset)
-        rot_matrix = []
-        for col in range(3):
-            for row in range(3):
-                rot_matrix.append(values[row*3+col])
-        pos = list(values[9:12])
-        scale = list(values[12:15])
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 60
-    except:
-        return None
-
-def try_parse_split_matrix(data, offset):
-    try:
-        values = struct.unpack_from('<9f3f3f', data, offset)
-        rot_matrix = list(values[0:9])
-        pos = list(values[9:12])
-        scale = list(values[12:15])
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 60
-    except:
-        return None
-
-def try_parse_packed_transform(data, offset):
-    try:
-        values = struct.unpack_from('<3f3f4f', data, offset)
-        pos = list(values[0:3])
-        scale = list(values[3:6])
-        quat = list(values[6:10])
-        return pos, scale, quat, 40
-    except:
-        return None
-
 def try_parse_inverted_4x4(data, offset):
     try:
         values = struct.unpack_from('<16f', data, offset)
@@ -684,91 +424,13 @@ def try_parse_trs_with_pivot(data, offset):
     except:
         return None
 
-def try_parse_half_precision(data, offset):
-    try:
-        import struct
-        values = []
-        for i in range(20):
-            half_val = struct.unpack_from('<H', data, offset + i*2)[0]
-            sign = (half_val >> 15) & 1
-            exp = (half_val >> 10) & 0x1f
-            frac = half_val & 0x3ff
-            
-            if exp == 0:
-                if frac == 0:
-                    f = 0.0
-                else:
-                    f = (frac / 1024.0) * (2**(-14))
-            elif exp == 31:
-                if frac == 0:
-                    f = float('inf')
-                else:
-                    f = float('nan')
-            else:
-                f = ((1.0 + frac / 1024.0)) * (2**(exp - 15))
-            
-            if sign:
-                f = -f
-            values.append(f)
-        
-        pos = values[0:3]
-        quat = values[3:7]
-        scale = values[7:10]
-        return pos, scale, quat, 40
-    except:
-        return None
-
-def try_parse_aligned_64(data, offset):
-    try:
-        values = struct.unpack_from('<16f', data, offset)
-        pos = [values[12], values[13], values[14]]
-        scale = [
-            math.sqrt(values[0]**2 + values[4]**2 + values[8]**2),
-            math.sqrt(values[1]**2 + values[5]**2 + values[9]**2),
-            math.sqrt(values[2]**2 + values[6]**2 + values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 64
-    except:
-        return None
+HALF_STRUCT = struct.Struct('<20e')
 
-def try_parse_aligned_80(data, offset):
-    try:
-        values = struct.unpack_from('<20f', data, offset)
-        pos = [values[12], values[13], values[14]]
-        scale = [
-            math.sqrt(values[0]**2 + values[4]**2 + values[8]**2),
-            math.sqrt(values[1]**2 + values[5]**2 + values[9]**2),
-            math.sqrt(values[2]**2 + values[6]**2 + values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 80
-    except:
-        return None
-
-def try_parse_aligned_96(data, offset):
+def try_parse_half_precision(data, offset):
+    # 20 IEEE halves, only the first 10 (pos, quat, scale) are used
     try:
-        values = struct.unpack_from('<24f', data, offset)
-        pos = [values[12], values[13], values[14]]
-        scale = [
-            math.sqrt(values[0]**2 + values[4]**2 + values[8]**2),
-            math.sqrt(values[1]**2 + values[5]**2 + values[9]**2),
-            math.sqrt(values[2]**2 + values[6]**2 + values[10]**2)
-        ]
-        rot_matrix = []
-        for i in range(3):
-            for j in range(3):
-                rot_matrix.append(values[i*4+j] / scale[j] if scale[j] != 0 else 0)
-        quat = quaternion_from_matrix(rot_matrix)
-        return pos, scale, quat, 96
+        values = HALF_STRUCT.unpack_from(data, offset)
+        return list(values[0:3]), list(values[7:10]), list(values[3:7]), 40
     except:
         return None
 
@@ -824,74 +486,51 @@ def try_parse_string_prefixed(data, offset):
         pass
     return None
 
-def try_parse_double_precision(data, offset):
-    try:
-        values = struct.unpack_from('<10d', data, offset)
-        pos = [float(values[0]), float(values[1]), float(values[2])]
-        quat = [float(values[3]), float(values[4]), float(values[5]), float(values[6])]
-        scale = [float(values[7]), float(values[8]), float(values[9])]
-        return pos, scale, quat, 80
-    except:
-        return None
-
-def try_parse_mixed_precision(data, offset):
-    try:
-        values = struct.unpack_from('<3d4f3f', data, offset)
-        pos = [float(values[0]), float(values[1]), float(values[2])]
-        quat = list(values[3:7])
-        scale = list(values[7:10])
-        return pos, scale, quat, 52
-    except:
-        return None
+# bitpacked field tables: 10-bit position, 10-bit yaw as (sin, cos) of the
+# half angle, 8-bit uniform scale
+BITPACKED_POS = [i / 10.0 - 50.0 for i in range(1024)]
+BITPACKED_YAW = [(math.sin(angle/2), math.cos(angle/2)) for angle in ((i / 1023.0) * math.pi * 2 for i in range(1024))]
+BITPACKED_SCALE = [0.5 + (i / 255.0) * 2.0 for i in range(256)]
 
 def try_parse_bitpacked(data, offset):
     try:
         packed_data = struct.unpack_from('<Q', data, offset)[0]
         
-        pos_x = ((packed_data >> 0) & 0x3FF) / 10.0 - 50.0
-        pos_y = ((packed_data >> 10) & 0x3FF) / 10.0 - 50.0
-        pos_z = ((packed_data >> 20) & 0x3FF) / 10.0 - 50.0
-        
-        rot_bits = (packed_data >> 30) & 0x3FF
-        angle = (rot_bits / 1023.0) * math.pi * 2
+        pos = [BITPACKED_POS[packed_data & 0x3FF],
+               BITPACKED_POS[(packed_data >> 10) & 0x3FF],
+               BITPACKED_POS[(packed_data >> 20) & 0x3FF]]
+        sin_half, cos_half = BITPACKED_YAW[(packed_data >> 30) & 0x3FF]
+        scale_val = BITPACKED_SCALE[(packed_data >> 40) & 0xFF]
         
-        quat = [0, 0, math.sin(angle/2), math.cos(angle/2)]
-        
-        scale_bits = (packed_data >> 40) & 0xFF
-        scale_val = 0.5 + (scale_bits / 255.0) * 2.0
-        
-        pos = [pos_x, pos_y, pos_z]
-        scale = [scale_val, scale_val, scale_val]
-        
-        return pos, scale, quat, 8
+        return pos, [scale_val, scale_val, scale_val], [0.0, 0.0, sin_half, cos_half], 8
     except:
         return None
 
+def decode_morton3(morton):
+    # Python int or uint64 array alike, so the bulk decoder matches bit for bit
+    x = morton & 0x9249249249249249
+    x = (x | (x >> 2)) & 0x30C30C30C30C30C3
+    x = (x | (x >> 4)) & 0xF00F00F00F00F00F
+    x = (x | (x >> 8)) & 0x00FF0000FF0000FF
+    x = (x | (x >> 16)) & 0x00000000FFFFFFFF
+    
+    y = (morton >> 1) & 0x9249249249249249
+    y = (y | (y >> 2)) & 0x30C30C30C30C30C3
+    y = (y | (y >> 4)) & 0xF00F00F00F00F00F
+    y = (y | (y >> 8)) & 0x00FF0000FF0000FF
+    y = (y | (y >> 16)) & 0x00000000FFFFFFFF
+    
+    z = (morton >> 2) & 0x9249249249249249
+    z = (z | (z >> 2)) & 0x30C30C30C30C30C3
+    z = (z | (z >> 4)) & 0xF00F00F00F00F00F
+    z = (z | (z >> 8)) & 0x00FF0000FF0000FF
+    z = (z | (z >> 16)) & 0x00000000FFFFFFFF
+    
+    return x, y, z
+
 def try_parse_morton_encoded(data, offset):
     try:
         morton = struct.unpack_from('<Q', data, offset)[0]
-        
-        def decode_morton3(morton):
-            x = morton & 0x9249249249249249
-            x = (x | (x >> 2)) & 0x30C30C30C30C30C3
-            x = (x | (x >> 4)) & 0xF00F00F00F00F00F
-            x = (x | (x >> 8)) & 0x00FF0000FF0000FF
-            x = (x | (x >> 16)) & 0x00000000FFFFFFFF
-            
-            y = (morton >> 1) & 0x9249249249249249
-            y = (y | (y >> 2)) & 0x30C30C30C30C30C3
-            y = (y | (y >> 4)) & 0xF00F00F00F00F00F
-            y = (y | (y >> 8)) & 0x00FF0000FF0000FF
-            y = (y | (y >> 16)) & 0x00000000FFFFFFFF
-            
-            z = (morton >> 2) & 0x9249249249249249
-            z = (z | (z >> 2)) & 0x30C30C30C30C30C3
-            z = (z | (z >> 4)) & 0xF00F00F00F00F00F
-            z = (z | (z >> 8)) & 0x00FF0000FF0000FF
-            z = (z | (z >> 16)) & 0x00000000FFFFFFFF
-            
-            return x, y, z
-        
         x, y, z = decode_morton3(morton)
         pos = [x / 1000.0, y / 1000.0, z / 1000.0]
         
@@ -908,144 +547,1593 @@ def is_fourcc(data, offset):
         return False
     chunk = data[offset:offset+4]
     return all(65 <= b <= 90 for b in chunk)  # 'A'..'Z'
-    
-def parse_lpmt_block(filename):
-    with open(filename, 'rb') as f:
-        data = f.read()
 
-    lpmt_pos = data.find(b'LPMT')
-    if lpmt_pos == -1:
-        print("LPMT block not found")
+FOURCC_RUN = re.compile(rb'[A-Z]{4,}')
+
+def build_fourcc_index(data):
+    # Same test as is_fourcc at every byte offset, but one regex pass over
+    # the whole buffer finds the uppercase runs; a run of n bytes holds n-3
+    # overlapping tags. Returns {tag: [offsets]}.
+    index = {}
+    for m in FOURCC_RUN.finditer(data):
+        run = m.group()
+        for i in range(len(run) - 3):
+            index.setdefault(run[i:i+4].decode('ascii'), []).append(m.start() + i)
+    return index
+
+def fourcc_offsets(index):
+    # every tag offset in the index, ascending
+    return sorted(offset for offsets in index.values() for offset in offsets)
+
+def load_fourcc_index(path, data, index_dir=None):
+    # build_fourcc_index persisted per file, reused while size and mtime match
+    st = os.stat(path)
+    name = hashlib.blake2b(os.path.abspath(path).encode('utf-8'), digest_size=16).hexdigest()
+    index_path = os.path.join(index_dir or os.path.join(default_cache_dir(), 'fourcc'), name + '.json')
+    try:
+        with open(index_path, 'r') as f:
+            stored = json.load(f)
+        if stored['size'] == st.st_size and stored['mtime_ns'] == st.st_mtime_ns:
+            return stored['tags']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    index = build_fourcc_index(data)
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(index_path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'path': os.path.abspath(path), 'size': st.st_size,
+                       'mtime_ns': st.st_mtime_ns, 'tags': index}, f)
+        os.replace(tmp, index_path)
+    except OSError:
+        pass
+    return index
+
+def fourcc_at(data, offset, tags=None):
+    # is_fourcc, or a lookup in the sorted offsets from fourcc_offsets
+    if tags is None:
+        return is_fourcc(data, offset)
+    i = bisect_left(tags, offset)
+    return i < len(tags) and tags[i] == offset
+
+def next_fourcc(data, offset, step, limit=None, tags=None):
+    # first offset + k*step below `limit` that holds a FourCC, or -1
+    limit = len(data) if limit is None else min(limit, len(data))
+    if tags is not None:
+        for i in range(bisect_left(tags, offset), len(tags)):
+            if tags[i] >= limit:
+                break
+            if (tags[i] - offset) % step == 0:
+                return tags[i]
+        return -1
+    while offset < limit:
+        if is_fourcc(data, offset):
+            return offset
+        offset += step
+    return -1
+
+def print_fourcc_index(data, index):
+    print(f"File size: 0x{len(data):08X} bytes")
+    for offset in fourcc_offsets(index):
+        print(f"{bytes(data[offset:offset+4]).decode('ascii')} @ 0x{offset:08X}")
+
+class ParserSchedule:
+    # Probe order for one run of entries, ranked by counts of valid decodes
+    # that decay by SCHEDULE_DECAY per hit, so a block's own layouts drift to
+    # the front and a homogeneous run costs one probe per entry. Equal counts
+    # go to the most recent hit, so the last layout (and its stride) is tried
+    # first. Only valid transforms count: most parsers return something for
+    # any bytes, and garbage decoded while resyncing must not promote them.
+    # The detected layout stays pinned in front: past a misaligned entry a
+    # promiscuous parser can decode (even plausibly) for a while, and must
+    # not permanently shadow the layout the block was detected as. It only
+    # gives way where it decodes invalid entries twice in a row, the point a
+    # mixed block switches layouts (see layout_run).
+    # With a FloatPrefilter the unpinned parsers are skipped wherever their
+    # leading float words (FLOAT_WINDOWS) aren't plausible floats.
+    # `first_parser` stands in for the pinned layout's own parser (a
+    # var_header parser with the block's header size locked in).
+    def __init__(self, first=None, decay=SCHEDULE_DECAY, prefilter=None, first_parser=None):
+        self.order = [(name, parser_func, FLOAT_WINDOWS.get(name)) for name, parser_func in PARSERS]
+        self.scores = [0.0] * len(self.order)
+        self.decay = decay
+        self.step = 1.0
+        self.pinned = 0
+        self.prefilter = prefilter
+        if first is not None:
+            i = next(i for i, (name, _, _) in enumerate(self.order) if name == first)
+            name, parser_func, window = self.order.pop(i)
+            self.order.insert(0, (name, first_parser or parser_func, window))
+            self.pinned = 1
+
+    def probe(self, data, offset):
+        # (position in the order, layout name, result, valid) of the first
+        # parser that decodes at offset. An invalid pinned entry followed by a
+        # valid one (or the end of the block) is a damaged entry and stands.
+        # Otherwise the pinned result only stands if no other layout decodes
+        # two valid entries in a row from here; FALLBACK_LAYOUTS decode any
+        # bytes as valid, so they never displace the pinned layout.
+        prefilter = self.prefilter
+        pinned = None
+        for i, (layout_name, parser_func, window) in enumerate(self.order):
+            if prefilter and window and i >= self.pinned and not prefilter.allows(offset, window):
+                continue
+            result = parser_func(data, offset)
+            if not result:
+                continue
+            valid = validate_transform(*result[:3])
+            if pinned is None:
+                if i >= self.pinned or valid or decodes_valid(parser_func, data, offset + result[3]):
+                    return i, layout_name, result, valid
+                pinned = (i, layout_name, result, valid)
+            elif valid and layout_name not in FALLBACK_LAYOUTS and decodes_valid(parser_func, data, offset + result[3]):
+                return i, layout_name, result, valid
+        return pinned
+
+    def hit(self, i):
+        # decay everything else by growing the step instead of scaling every
+        # count; only the entry that hit can move, and only forward (never
+        # past a pinned layout)
+        scores, order = self.scores, self.order
+        scores[i] += self.step
+        self.step /= self.decay
+        while i > self.pinned and scores[i] >= scores[i - 1]:
+            scores[i - 1], scores[i] = scores[i], scores[i - 1]
+            order[i - 1], order[i] = order[i], order[i - 1]
+            i -= 1
+        if self.step > 1e100:
+            self.scores = [s / self.step for s in scores]
+            self.step = 1.0
+
+def decodes_valid(parser_func, data, offset):
+    # the next entry is a valid one, or there is none (end of data or a tag)
+    if offset >= len(data) or is_fourcc(data, offset):
+        return True
+    result = parser_func(data, offset)
+    return bool(result) and validate_transform(*result[:3])
+
+def plausible_float_runs(data, start, count):
+    # For `count` words from byte `start`: how many consecutive words from
+    # each one are plausible float32 values (capped at PREFILTER_CAP), in one
+    # vectorized pass. Words past the end of the data count as implausible.
+    count = max(0, min(count, (len(data) - start) // 4))
+    words = np.frombuffer(data, dtype='<u4', count=count, offset=start) if count else np.zeros(0, np.uint32)
+    exp = (words >> 23) & 0xFF
+    ok = ((exp >= PLAUSIBLE_EXP[0]) & (exp <= PLAUSIBLE_EXP[1])) | ((words & 0x7FFFFFFF) == 0)
+    del words
+    idx = np.arange(count, dtype=np.int32)
+    next_bad = np.minimum.accumulate(np.where(ok, count, idx)[::-1])[::-1]
+    return memoryview(np.minimum(next_bad - idx, PREFILTER_CAP).astype(np.uint8))
+
+class FloatPrefilter:
+    # Plausible-float run lengths over `data`, built `window` words at a time
+    # per 4-byte phase, and only where something asks: clean
+    # blocks never probe outside the detected layout, so they never pay for it.
+    def __init__(self, data, window=PREFILTER_WINDOW):
+        self.data = data
+        self.window = window
+        self.windows = {}
+
+    def run(self, offset):
+        k, i = divmod(offset >> 2, self.window)
+        key = (offset & 3, k)
+        runs = self.windows.get(key)
+        if runs is None:
+            runs = self.windows[key] = plausible_float_runs(
+                self.data, (offset & 3) + 4 * k * self.window, self.window + PREFILTER_CAP)
+        return runs[i] if i < len(runs) else 0
+
+    def allows(self, offset, window):
+        # window is (possible float starts relative to offset, words needed)
+        starts, count = window
+        for start in starts:
+            if self.run(offset + start) >= count:
+                return True
+        return False
+
+def score_layout(data, offset, parser_func, samples=DETECT_SAMPLES):
+    # Decodes up to `samples` consecutive entries with one layout and rates how
+    # plausible the run is: valid transforms, unit quaternions and a constant
+    # stride that lands cleanly on the next FourCC tag all add up; a run the
+    # layout can't follow to the next entry costs as much as a clean landing
+    # earns.
+    start = offset
+    score = 0.0
+    decoded = 0
+    sizes = set()
+    while decoded < samples and offset < len(data):
+        if is_fourcc(data, offset):
+            score += 1.0
+            break
+        result = parser_func(data, offset)
+        if not result:
+            if decoded:
+                score -= 1.0
+            break
+        pos, scale, quat, size = result
+        try:
+            quat_err = abs(math.sqrt(sum(q*q for q in quat)) - 1.0)
+            score += 1.0 if quat_err < 1e-3 else max(0.0, 1.0 - quat_err)
+        except:
+            pass
+        if validate_transform(pos, scale, quat):
+            score += 2.0
+        sizes.add(size)
+        offset += size
+        decoded += 1
+    if decoded == 0:
+        return 0.0, 0, 0
+    score -= len(sizes) - 1
+    return score / decoded, decoded, offset - start
+
+def detect_layout(data, offset, samples=DETECT_SAMPLES, parsers=None):
+    # layouts whose first entry doesn't even start with plausible floats
+    # aren't scored at all. FALLBACK_LAYOUTS score near perfectly on arbitrary
+    # bytes, so they are only scored when no other layout reaches
+    # PLAUSIBLE_SCORE. var_header layouts are scored with their header size
+    # locked, the way the block will be decoded: the searching parser can
+    # pick a different header per entry and read almost anything.
+    prefilter = FloatPrefilter(data, PREFILTER_CAP) if np is not None else None
+    parsers = parsers or PARSERS
+    best = None
+    for fallback in (False, True):
+        if fallback and best is not None and best[2] >= PLAUSIBLE_SCORE:
+            break
+        for layout_name, parser_func in parsers:
+            if (layout_name in FALLBACK_LAYOUTS) != fallback:
+                continue
+            window = FLOAT_WINDOWS.get(layout_name)
+            if prefilter and window and not prefilter.allows(offset, window):
+                continue
+            if layout_name in VAR_HEADER_PARSERS:
+                header = var_header_size(data, offset, layout_name, samples)
+                if header is None:
+                    continue
+                parser_func = var_header_parser(layout_name, header)
+            score, decoded, covered = score_layout(data, offset, parser_func, samples)
+            if decoded == 0:
+                continue
+            # equal scores go to the layout that explains more of the block, so a
+            # tiny always-valid decoder (bitpacked) can't shadow the real stride
+            if best is None or (score, covered) > (best[2], best[4]):
+                best = (layout_name, parser_func, score, decoded, covered)
+    return best
+
+class ParserStats:
+    # Opt-in counters per layout: calls, results, results that pass
+    # validate_transform, exceptions raised inside the parser (its own bare
+    # except included) and cumulative seconds; plus the bytes decode_entries
+    # skipped 4 at a time looking for the next decodable entry. The seconds
+    # include the counting overhead, so compare them between parsers rather
+    # than against an uninstrumented run. 'bulk' counts the entries decoded
+    # by the layout's vectorized form, which never calls the parser.
+    FIELDS = ('calls', 'hits', 'valid', 'exceptions', 'seconds', 'bulk')
+
+    def __init__(self):
+        self.parsers = {name: [0, 0, 0, 0, 0.0, 0] for name, _ in LAYOUTS}
+        self.skipped = 0
+
+    def snapshot(self):
+        return {
+            'parsers': {name: dict(zip(self.FIELDS, c)) for name, c in self.parsers.items()},
+            'resync_bytes': self.skipped,
+        }
+
+    def take(self):
+        # snapshot and reset, so per-file counts from batch workers can be
+        # merged without counting anything twice
+        # (counters are reset in place, the wrappers hold on to them)
+        snap = self.snapshot()
+        for counters in self.parsers.values():
+            counters[:] = [0, 0, 0, 0, 0.0, 0]
+        self.skipped = 0
+        return snap
+
+    def merge(self, snap):
+        for name, fields in snap['parsers'].items():
+            counters = self.parsers.setdefault(name, [0, 0, 0, 0, 0.0, 0])
+            for i, field in enumerate(self.FIELDS):
+                counters[i] += fields[field]
+        self.skipped += snap['resync_bytes']
+
+    def table(self):
+        lines = [f"{'layout':<20} {'calls':>9} {'hits':>9} {'valid':>9} {'exc':>8} {'hit%':>6} {'seconds':>9} {'us/call':>8} {'bulk':>9}"]
+        for name, (calls, hits, valid, exceptions, seconds, bulk) in sorted(
+                self.parsers.items(), key=lambda item: (-item[1][4], -item[1][5])):
+            if not calls and not bulk:
+                continue
+            hit_pct = f"{100.0 * hits / calls:>6.1f}" if calls else f"{'-':>6}"
+            per_call = f"{1e6 * seconds / calls:>8.2f}" if calls else f"{'-':>8}"
+            lines.append(f"{name:<20} {calls:>9} {hits:>9} {valid:>9} {exceptions:>8} "
+                         f"{hit_pct} {seconds:>9.4f} {per_call} {bulk:>9}")
+        lines.append(f"Resync skipped {self.skipped} bytes")
+        return "\n".join(lines)
+
+def instrument_parser(name, parser_func, stats):
+    # Exceptions a parser catches itself never reach the caller, so they are
+    # counted with a tracer that is only installed for the duration of the
+    # call and only follows the parser's own frame (no per-line events).
+    counters = stats.parsers[name]
+    code = parser_func.__code__
+    perf_counter, gettrace, settrace = time.perf_counter, sys.gettrace, sys.settrace
+
+    def on_exception(frame, event, arg):
+        if event == 'exception':
+            counters[3] += 1
+        return on_exception
+
+    def on_call(frame, event, arg):
+        if frame.f_code is code:
+            frame.f_trace_lines = False
+            return on_exception
+        return None
+
+    def parse(data, offset, *args):
+        counters[0] += 1
+        previous = gettrace()
+        start = perf_counter()
+        settrace(on_call)
+        try:
+            result = parser_func(data, offset, *args)
+        finally:
+            settrace(previous)
+            counters[4] += perf_counter() - start
+        if result:
+            counters[1] += 1
+            if validate_transform(*result[:3]):
+                counters[2] += 1
+        return result
+    return parse
+
+def enable_instrumentation():
+    # swaps every parser in PARSERS and LAYOUT_FAMILIES, and the body parsers
+    # var_header blocks decode with once their header size is locked, for a
+    # counting wrapper; idempotent, returns the live ParserStats
+    global INSTRUMENT
+    if INSTRUMENT is None:
+        INSTRUMENT = ParserStats()
+        wrapped = {name: instrument_parser(name, parser_func, INSTRUMENT) for name, parser_func in PARSERS}
+        PARSERS[:] = [(name, wrapped[name]) for name, _ in PARSERS]
+        for family in LAYOUT_FAMILIES.values():
+            family[:] = [(name, wrapped[name]) for name, _ in family]
+        for name, parse in VAR_HEADER_PARSERS.items():
+            VAR_HEADER_PARSERS[name] = instrument_parser(name, parse, INSTRUMENT)
+    return INSTRUMENT
+
+def report_stats(fmt='table', path=None):
+    if INSTRUMENT is None:
         return
+    text = json.dumps(INSTRUMENT.snapshot(), indent=1) if fmt == 'json' else INSTRUMENT.table()
+    if path:
+        with open(path, 'w') as f:
+            f.write(text + "\n")
+    else:
+        sys.stderr.write(text + "\n")
+
+def default_cache_dir():
+    base = os.environ.get('LOCALAPPDATA') if os.name == 'nt' else os.environ.get('XDG_CACHE_HOME')
+    return os.path.join(base or os.path.join(os.path.expanduser('~'), '.cache'), 'fullparser')
+
+def layout_fingerprint(data, lpmt_pos):
+    # LPMT tag + entry_count header and a hash of the first entries' bytes
+    header = bytes(data[lpmt_pos:lpmt_pos + 8])
+    body = bytes(data[lpmt_pos + 8:lpmt_pos + 8 + FINGERPRINT_BYTES])
+    return header.hex() + ':' + hashlib.blake2b(body, digest_size=16).hexdigest()
 
+class LayoutCache:
+    # JSON store of fingerprint -> detected layout. Dict order doubles as LRU
+    # order: hits move to the end, eviction drops from the front. Lookups and
+    # new entries only change memory; save() writes them out once (per file
+    # in batch workers, at exit otherwise).
+    def __init__(self, path=None, max_entries=CACHE_MAX_ENTRIES):
+        self.path = path or os.path.join(default_cache_dir(), 'layouts.json')
+        self.max_entries = max_entries
+        self.entries = self.load()
+        self.dirty = {}
+        self.touched = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key):
+        # a hit is only an LRU touch, replayed on the next save that has
+        # something new to write
+        hit = self.entries.pop(key, None)
+        if hit is not None:
+            self.entries[key] = hit
+            self.touched[key] = None
+        return hit
+
+    def put(self, key, value):
+        self.entries.pop(key, None)
+        self.entries[key] = value
+        self.dirty[key] = value
+
+    def save(self):
+        # merge with whatever other processes wrote since we loaded, under an
+        # exclusive lock so concurrent batch workers can't drop each other's
+        # entries, then replace the file atomically so readers never see it torn
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with file_lock(self.path + '.lock'):
+                entries = self.load()
+                for key in self.touched:
+                    if key in entries:
+                        entries[key] = entries.pop(key)
+                for key, value in self.dirty.items():
+                    entries.pop(key, None)
+                    entries[key] = value
+                while len(entries) > self.max_entries:
+                    del entries[next(iter(entries))]
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(entries, f)
+                os.replace(tmp, self.path)
+        except OSError:
+            return
+        self.entries = entries
+        self.dirty = {}
+        self.touched = {}
+
+@contextmanager
+def file_lock(path):
+    # exclusive advisory lock held for the duration of the block (flock, or
+    # msvcrt.locking on Windows); released when the lock file is closed
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is None and msvcrt is not None:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def header_stride(data, lpmt_pos, tags=None):
+    # Stride implied by the header: the smallest known layout size for which
+    # entry_count entries end exactly on a FourCC tag (or the end of the
+    # block). Only one position per candidate size is checked, no scanning.
+    # None when entry_count doesn't fit any of them.
     entry_count = struct.unpack_from('<I', data, lpmt_pos + 4)[0]
-    print(f"LPMT block found at 0x{lpmt_pos:X}")
-    print(f"Header entry_count: {entry_count}")
-    print()
+    base_offset = lpmt_pos + 8
+    if entry_count == 0:
+        return None
+    for stride in sorted(LAYOUT_FAMILIES):
+        end = base_offset + entry_count * stride
+        if end > len(data):
+            break
+        if end == len(data) or fourcc_at(data, end, tags):
+            return stride
+    return None
+
+def detect_stride_family(data, offset, samples=DETECT_SAMPLES, stride=None):
+    # with a header stride only that size's layouts are scored; the full
+    # detection pass only runs if none of them decodes plausibly
+    if stride in LAYOUT_FAMILIES:
+        detected = detect_layout(data, offset, samples, LAYOUT_FAMILIES[stride])
+        if detected and detected[2] >= PLAUSIBLE_SCORE:
+            return detected
+    return detect_layout(data, offset, samples)
+
+def var_header_size(data, offset, layout_name, samples=DETECT_SAMPLES, stride=None):
+    # Learns a var_header block's header size once. The bodies of consecutive
+    # entries recur every entry size the body parser reports, so among the
+    # sizes that decode the first entry, the one whose period keeps landing on
+    # plausible float runs the longest wins (ties to the smaller header, the
+    # order the searching parser tries them). A header stride pins the size
+    # outright. Without numpy the period is followed with the body parser.
+    parse, floats = VAR_HEADER_PARSERS[layout_name], FUNCTION_FLOATS[layout_name][1]
+    sizes = VAR_HEADER_SIZES
+    if stride is not None and stride - 4 * floats in VAR_HEADER_SIZES:
+        sizes = [stride - 4 * floats]
+    if np is not None:
+        span = samples * (max(sizes) + 4 * floats)
+        runs = [plausible_float_runs(data, offset + phase, span // 4 + 1) for phase in range(4)]
+    best, best_run = None, 0
+    for header_size in sizes:
+        try:
+            first = parse(data, offset, header_size)
+        except:
+            continue
+        if not first:
+            continue
+        period = first[3]
+        run = 1
+        while run < samples:
+            at = run * period + header_size
+            if np is not None:
+                words = runs[at & 3]
+                if (at >> 2) >= len(words) or words[at >> 2] < floats:
+                    break
+            else:
+                try:
+                    if not parse(data, offset + run * period, header_size):
+                        break
+                except:
+                    break
+            run += 1
+        if run > best_run:
+            best, best_run = header_size, run
+    return best
+
+def var_header_parser(layout_name, header_size):
+    # the layout's parser with the block's header size locked in: one
+    # precompiled body unpack per entry instead of up to one per header size
+    parse = VAR_HEADER_PARSERS[layout_name]
+    def parse_locked(data, offset):
+        try:
+            return parse(data, offset, header_size)
+        except:
+            return None
+    return parse_locked
+
+def layout_header(data, offset, layout_name, samples=DETECT_SAMPLES, stride=None):
+    # bytes before each entry's body: fixed for bulk layouts, learned once per
+    # block for var_header ones (None when no size decodes)
+    if layout_name in VAR_HEADER_PARSERS:
+        return var_header_size(data, offset, layout_name, samples, stride)
+    return BULK_LAYOUTS[layout_name][1] if layout_name in BULK_LAYOUTS else 0
 
+def lock_layout(detected, header):
+    if detected and detected[0] in VAR_HEADER_PARSERS and header in VAR_HEADER_SIZES:
+        return (detected[0], var_header_parser(detected[0], header)) + tuple(detected[2:])
+    return detected
+
+def detect_block_layout(data, lpmt_pos, samples=DETECT_SAMPLES, cache=None, stride=None):
+    # detect_stride_family with an optional LayoutCache in front of it. The
+    # returned parser has a var_header block's header size locked in.
     base_offset = lpmt_pos + 8
-    current_offset = base_offset
-    
-    parsers = [
-        ("4x4_matrix", "try_parse_4x4_matrix"),
-        ("3x4_matrix", "try_parse_3x4_matrix"),
-        ("pos_quat_scale", "try_parse_pos_quat_scale"),
-        ("quat_pos_scale", "try_parse_quat_pos_scale"),
-        ("scale_pos_quat", "try_parse_scale_pos_quat"),
-        ("1int+16f", "try_parse_1int_16f"),
-        ("2int+16f", "try_parse_2int_16f"),
-        ("1int+12f", "try_parse_1int_12f"),
-        ("2int+12f", "try_parse_2int_12f"),
-        ("4byte_pad+16f", "try_parse_4byte_pad_16f"),
-        ("8byte_pad+12f", "try_parse_8byte_pad_12f"),
-        ("1short+16f", "try_parse_1short_16f"),
-        ("2short+16f", "try_parse_2short_16f"),
-        ("1byte+16f", "try_parse_1byte_16f"),
-        ("4byte+16f", "try_parse_4byte_16f"),
-        ("transposed_4x4", "try_parse_transposed_4x4"),
-        ("transposed_3x4", "try_parse_transposed_3x4"),
-        ("1int+10f", "try_parse_1int_10f"),
-        ("2int+10f", "try_parse_2int_10f"),
-        ("16byte_pad+16f", "try_parse_16byte_pad_16f"),
-        ("12byte_pad+12f", "try_parse_12byte_pad_12f"),
-        ("3int+16f", "try_parse_3int_16f"),
-        ("4int+12f", "try_parse_4int_12f"),
-        ("euler_angles", "try_parse_euler_angles"),
-        ("axis_angle", "try_parse_axis_angle"),
-        ("dual_quaternion", "try_parse_dual_quaternion"),
-        ("compact_quat", "try_parse_compact_quat"),
-        ("1int+3f+4f+3f", "try_parse_1int_3f_4f_3f"),
-        ("2int+3f+4f+3f", "try_parse_2int_3f_4f_3f"),
-        ("var_header+16f", "try_parse_variable_header_16f"),
-        ("var_header+12f", "try_parse_variable_header_12f"),
-        ("var_header+10f", "try_parse_variable_header_10f"),
-        ("row_3x3+pos+scale", "try_parse_row_major_3x3_plus_pos_scale"),
-        ("col_3x3+pos+scale", "try_parse_col_major_3x3_plus_pos_scale"),
-        ("split_matrix", "try_parse_split_matrix"),
-        ("packed_transform", "try_parse_packed_transform"),
-        ("inverted_4x4", "try_parse_inverted_4x4"),
-        ("decomposed_trans", "try_parse_decomposed_transform"),
-        ("trs_with_pivot", "try_parse_trs_with_pivot"),
-        ("half_precision", "try_parse_half_precision"),
-        ("aligned_64", "try_parse_aligned_64"),
-        ("aligned_80", "try_parse_aligned_80"),
-        ("aligned_96", "try_parse_aligned_96"),
-        ("compressed_quat", "try_parse_compressed_quat"),
-        ("nested_structure", "try_parse_nested_structure"),
-        ("string_prefixed", "try_parse_string_prefixed"),
-        ("double_precision", "try_parse_double_precision"),
-        ("mixed_precision", "try_parse_mixed_precision"),
-        ("bitpacked", "try_parse_bitpacked"),
-        ("morton_encoded", "try_parse_morton_encoded")
-    ]
+    if cache is None:
+        detected = detect_stride_family(data, base_offset, samples, stride)
+        if detected:
+            detected = lock_layout(detected, layout_header(data, base_offset, detected[0], samples, stride))
+        return detected
+    key = layout_fingerprint(data, lpmt_pos)
+    hit = cache.get(key)
+    if hit and hit.get('layout') in LAYOUT_IDS:
+        return lock_layout((hit['layout'], PARSERS[LAYOUT_IDS[hit['layout']]][1],
+                            hit['score'], hit['decoded'], hit['covered']), hit.get('header'))
+    detected = detect_stride_family(data, base_offset, samples, stride)
+    if detected:
+        layout_name, _, score, decoded, covered = detected
+        header = layout_header(data, base_offset, layout_name, samples, stride)
+        cache.put(key, {
+            'layout': layout_name,
+            'stride': covered // decoded,
+            'header': header,
+            'score': score,
+            'decoded': decoded,
+            'covered': covered,
+        })
+        detected = lock_layout(detected, header)
+    return detected
 
-    
-    entry_idx = 0
-    while current_offset < len(data):
-        if is_fourcc(data, current_offset):
-            print(f"Next FourCC tag at 0x{current_offset:X}, stopping LPMT parsing")
-            break
+def print_entry(entry_idx, entry):
+    pos, scale, quat = entry.pos, entry.scale, entry.quat
+    quat_len = math.sqrt(sum(q*q for q in quat))
+    print(f"===== Entry {entry_idx} @ 0x{entry.offset:X} =====")
+    print(f"Entry {entry_idx} @ offset 0x{entry.offset:X}")
+    print(f"  Layout: {entry.layout}")
+    print(f"  Pos: [{pos[0]:.3f}, {pos[1]:.3f}, {pos[2]:.3f}]")
+    print(f"  Scale: [{scale[0]:.3f}, {scale[1]:.3f}, {scale[2]:.3f}]")
+    print(f"  Quat: [{quat[0]:.3f}, {quat[1]:.3f}, {quat[2]:.3f}, {quat[3]:.3f}]")
+    print(f"  QuatLen: {quat_len:.3f}")
+    print(f"  Valid: {'YES' if entry.valid else 'NO'}\n")
 
-        print(f"===== Entry {entry_idx} @ 0x{current_offset:X} =====")
-        found = False
-        for layout_name, parser_name in parsers:
-            parser_func = globals().get(parser_name)
-            if not parser_func:
-                continue
-            result = parser_func(data, current_offset)
+def bulk_fourcc_mask(data, offset, stride, count):
+    # is_fourcc evaluated at every stride boundary in one pass
+    count = min(count, max(0, (len(data) - offset - 4) // stride + 1))
+    if count <= 0:
+        return np.zeros(0, dtype=bool)
+    dt = np.dtype({'names': ['tag'], 'formats': [('u1', 4)], 'offsets': [0], 'itemsize': stride})
+    if offset + count * stride > len(data):
+        tags = np.lib.stride_tricks.as_strided(
+            np.frombuffer(data, dtype=np.uint8, offset=offset), shape=(count, 4), strides=(stride, 1))
+    else:
+        tags = np.frombuffer(data, dtype=dt, count=count, offset=offset)['tag']
+    return ((tags >= 65) & (tags <= 90)).all(axis=1)
+
+def block_entry_count(data, offset, stride, max_entries=None, tags=None):
+    # number of whole entries before the next FourCC on a stride boundary
+    count = (len(data) - offset) // stride
+    if max_entries is not None:
+        count = min(count, max_entries)
+    if tags is not None or np is None:
+        tag = next_fourcc(data, offset, stride, offset + count * stride, tags)
+        return (tag - offset) // stride if tag != -1 else count
+    mask = bulk_fourcc_mask(data, offset, stride, count)
+    return int(mask.argmax()) if mask.any() else count
+
+def layout_run(valid):
+    # entries before the first two invalid ones in a row: a lone invalid
+    # entry is a damaged one, two mark where a mixed block switches layouts
+    switch = ~valid[:-1] & ~valid[1:]
+    return int(switch.argmax()) if switch.any() else len(valid)
+
+def decode_block_bulk(data, offset, layout_name, max_entries=None, tags=None, denominators=None):
+    # Decodes the entries of a fixed-stride layout starting at `offset` up to
+    # the next FourCC tag (or end of data / max_entries) in one vectorized
+    # pass, stopping where the block switches layouts (layout_run). Returns
+    # (count, pos, scale, quat, valid) with (N,3)/(N,3)/(N,4) float64 arrays
+    # and validate_transform_bulk's mask, or None when the layout has no bulk
+    # form, numpy is unavailable or the first entries aren't this layout.
+    # Fixed-point layouts use `denominators`, or infer them from these entries.
+    spec = BULK_LAYOUTS.get(layout_name)
+    if np is None or spec is None:
+        return None
+    count = block_entry_count(data, offset, spec[0], max_entries, tags)
+    if count <= 0:
+        return None
+    bulk = decode_bulk_values(data, offset, count, spec, denominators)
+    if not bulk:
+        return None
+    count, pos, scale, quat = bulk
+    valid = validate_transform_bulk(pos, scale, quat)
+    run = layout_run(valid)
+    if run == 0:
+        return None
+    if run < count:
+        pos, scale, quat, valid = pos[:run], scale[:run], quat[:run], valid[:run]
+    return run, pos, scale, quat, valid
+
+def decode_bulk_values(data, offset, count, spec, denominators=None):
+    # (count, pos, scale, quat) for `count` entries of a BULK_LAYOUTS spec;
+    # the 16-bit quaternion and fixed-point layouts stop early, like their
+    # scalar parsers
+    stride, header, kind, arg = spec
+    if kind == 'q16':
+        return decode_quat16_bulk(data, offset, count, stride, header, arg)
+
+    if kind == 'fixed':
+        return decode_fixed_bulk(data, offset, count, arg, denominators)
+
+    if kind == 'morton':
+        return decode_morton_bulk(data, offset, count)
+
+    if kind == 'bitpacked':
+        return decode_bitpacked_bulk(data, offset, count)
+
+    if kind == 'pqs':
+        fields, ftype = arg
+        width = 10
+    else:
+        ftype = '<f4'
+        width = {'4x4': 16, '3x4': 12, 't4x4': 16, 't3x4': 12, 'r3x3': 15, 'c3x3': 15}[kind]
+    dt = np.dtype({'names': ['v'], 'formats': [(ftype, width)], 'offsets': [header], 'itemsize': stride})
+    with np.errstate(all='ignore'):
+        v = np.frombuffer(data, dtype=dt, count=count, offset=offset)['v'].astype(np.float64)
+
+    if kind == 'pqs':
+        p, q, s = fields
+        return count, v[:, p:p+3], v[:, s:s+3], v[:, q:q+4]
+
+    if kind in ('r3x3', 'c3x3'):
+        rot = v[:, 0:9]
+        if kind == 'c3x3':
+            rot = rot.reshape(-1, 3, 3).transpose(0, 2, 1).reshape(-1, 9)
+        return count, v[:, 9:12], v[:, 12:15], quaternion_from_matrix_bulk(rot)
+
+    if kind == '4x4':
+        m = v[:, 0:12].reshape(-1, 3, 4)[:, :, 0:3]
+        pos = v[:, 12:15]
+        scale = np.sqrt((m * m).sum(axis=1))
+    elif kind == '3x4':
+        m = v[:, 0:9].reshape(-1, 3, 3)
+        pos = v[:, 9:12]
+        scale = np.sqrt((m * m).sum(axis=1))
+    else:
+        # transposed layouts: translation in the last column, scale per row
+        rows = v[:, 0:12].reshape(-1, 3, 4)
+        m = rows[:, :, 0:3]
+        pos = rows[:, :, 3]
+        scale = np.sqrt((m * m).sum(axis=2))
+    with np.errstate(all='ignore'):
+        rot = np.where(scale[:, None, :] != 0, m / scale[:, None, :], 0.0)
+    if kind == 't4x4':
+        rot = rot.transpose(0, 2, 1)
+    return count, pos, scale, quaternion_from_matrix_bulk(rot.reshape(-1, 9))
+
+def decode_quat16_bulk(data, offset, count, stride, header, qtype):
+    # pos 3f, quat 4h (/32767) or 4H (mapped to -1..1), scale 3f, quat
+    # renormalized. Like the scalar parsers, an entry whose stored quaternion
+    # isn't unit length or whose transform is invalid isn't this layout: the
+    # run stops before it so the caller can probe from there.
+    dt = np.dtype({'names': ['p', 'q', 's'], 'formats': [('<f4', 3), (qtype, 4), ('<f4', 3)],
+                   'offsets': [header, header + 12, header + 20], 'itemsize': stride})
+    rec = np.frombuffer(data, dtype=dt, count=count, offset=offset)
+    pos = rec['p'].astype(np.float64)
+    scale = rec['s'].astype(np.float64)
+    q = rec['q'].astype(np.float64)
+    q = q / 32767.0 if qtype == '<i2' else (q / 65535.0) * 2.0 - 1.0
+    ln = np.sqrt((q * q).sum(axis=1))
+    with np.errstate(all='ignore'):
+        quat = q / ln[:, None]
+    ok = (np.abs(ln - 1.0) <= 0.1) & validate_transform_bulk(pos, scale, quat)
+    if not ok.all():
+        count = int(ok.argmin())
+        if count == 0:
+            return None
+        pos, scale, quat = pos[:count], scale[:count], quat[:count]
+    return count, pos, scale, quat
+
+def decode_morton_bulk(data, offset, count):
+    # 64-bit Morton key de-interleaved across the whole run, then 4f quat, 3f scale
+    dt = np.dtype({'names': ['m', 'q', 's'], 'formats': ['<u8', ('<f4', 4), ('<f4', 3)],
+                   'offsets': [0, 8, 24], 'itemsize': 36})
+    rec = np.frombuffer(data, dtype=dt, count=count, offset=offset)
+    pos = np.stack(decode_morton3(rec['m']), axis=1).astype(np.float64) / 1000.0
+    return count, pos, rec['s'].astype(np.float64), rec['q'].astype(np.float64)
+
+def decode_bitpacked_bulk(data, offset, count):
+    # one uint64 per entry; every field goes through the BITPACKED_* tables
+    words = np.frombuffer(data, dtype='<u8', count=count, offset=offset)
+    pos = np.asarray(BITPACKED_POS)[np.stack([words & 0x3FF, (words >> 10) & 0x3FF, (words >> 20) & 0x3FF], axis=1)]
+    quat = np.zeros((count, 4))
+    quat[:, 2:4] = np.asarray(BITPACKED_YAW)[(words >> 30) & 0x3FF]
+    scale = np.repeat(np.asarray(BITPACKED_SCALE)[(words >> 40) & 0xFF][:, None], 3, axis=1)
+    return count, pos, scale, quat
+
+def fixed_point_records(data, offset, count, spec):
+    ptype = spec[0]
+    width = 3 * np.dtype(ptype).itemsize
+    dt = np.dtype({'names': ['p', 'q', 's'], 'formats': [(ptype, 3), ('<i2', 4), ('<i2', 3)],
+                   'offsets': [0, width, width + 8], 'itemsize': width + 14})
+    return np.frombuffer(data, dtype=dt, count=count, offset=offset)
+
+def infer_denominators(rec, spec):
+    # Block-level quantization: the first pos and scale denominators, in the
+    # order the scalar parser tries them, that keep every entry in range
+    # (|pos| <= 1e6, scale <= 1000). `rec` is the run the bulk decoder keeps.
+    _, pos_denoms, scale_denoms = spec
+    if not len(rec):
+        return pos_denoms[0], scale_denoms[0]
+    pmax = int(np.abs(rec['p'].astype(np.int64)).max())
+    smax = int(rec['s'].max())
+    pd = next((d for d in pos_denoms if pmax / d <= 1e6), pos_denoms[-1])
+    sd = next((d for d in scale_denoms if smax / d <= 1000), scale_denoms[-1])
+    return pd, sd
+
+def fixed_point_denominators(data, offset, layout_name, max_entries=None, tags=None):
+    # (pos, scale) denominators for the fixed-point block at `offset`, the
+    # same ones decode_fixed_bulk infers over the whole run; None for other
+    # layouts or without numpy
+    spec = BULK_LAYOUTS.get(layout_name)
+    if np is None or spec is None or spec[2] != 'fixed':
+        return None
+    count = block_entry_count(data, offset, spec[0], max_entries, tags)
+    if count <= 0:
+        return None
+    rec = fixed_point_records(data, offset, count, spec[3])
+    zero = ~rec['q'].any(axis=1)
+    if zero.any():
+        rec = rec[:int(zero.argmax())]
+    return infer_denominators(rec, spec[3])
+
+def decode_fixed_bulk(data, offset, count, spec, denominators=None):
+    # Decodes with one denominator pair for the whole run instead of searching
+    # per entry. A quaternion that isn't stored unit length ends the run, as it
+    # does in the scalar parser.
+    rec = fixed_point_records(data, offset, count, spec)
+    q = rec['q'].astype(np.float64) / 32767.0
+    ln = np.sqrt((q * q).sum(axis=1))
+    bad = np.abs(ln - 1.0) > 0.1
+    if bad.any():
+        count = int(bad.argmax())
+        if count == 0:
+            return None
+        rec, q, ln = rec[:count], q[:count], ln[:count]
+    pd, sd = denominators or infer_denominators(rec, spec)
+    pos = rec['p'].astype(np.float64) / pd
+    scale = np.maximum(1e-6, rec['s'].astype(np.float64) / sd)
+    quat = q / ln[:, None]
+    return count, pos, scale, quat
+
+def decode_chunk(path, offset, count, layout_name, denominators=None):
+    # Worker side of decode_block_parallel: maps the file itself so only the
+    # (path, offset, count) triple crosses the process boundary.
+    data = map_file(path)
+    try:
+        bulk = decode_block_bulk(data, offset, layout_name, count, denominators=denominators)
+        if bulk:
+            _, pos, scale, quat, valid = bulk
+            return pos.astype(np.float32), scale.astype(np.float32), quat.astype(np.float32), valid
+        if np is not None:
+            # the layout rejects the chunk's first entries
+            return np.empty((0, 3), np.float32), np.empty((0, 3), np.float32), np.empty((0, 4), np.float32), np.empty(0, bool)
+        parser_func = PARSERS[LAYOUT_IDS[layout_name]][1]
+        stride = BULK_LAYOUTS[layout_name][0]
+        entries = []
+        for i in range(count):
+            result = parser_func(data, offset + i * stride)
             if result:
                 pos, scale, quat, size = result
-                quat_len = math.sqrt(sum(q*q for q in quat))
-                is_valid = validate_transform(pos, scale, quat)
-                print(f"Entry {entry_idx} @ offset 0x{current_offset:X}")
-                print(f"  Layout: {layout_name}")
-                print(f"  Pos: [{pos[0]:.3f}, {pos[1]:.3f}, {pos[2]:.3f}]")
-                print(f"  Scale: [{scale[0]:.3f}, {scale[1]:.3f}, {scale[2]:.3f}]")
-                print(f"  Quat: [{quat[0]:.3f}, {quat[1]:.3f}, {quat[2]:.3f}, {quat[3]:.3f}]")
-                print(f"  QuatLen: {quat_len:.3f}")
-                print(f"  Valid: {'YES' if is_valid else 'NO'}\n")
-                current_offset += size
-                entry_idx += 1
-                found = True
+                entries.append(LpmtEntry(offset + i * stride, layout_name, pos, scale, quat,
+                                         validate_transform(pos, scale, quat), size))
+        return entries
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+def decode_block_parallel(table, path, offset, count, layout_name, jobs=None, denominators=None):
+    # Splits `count` fixed-stride entries into stride-aligned chunks, decodes
+    # them across worker processes over their own mapping of `path` and
+    # appends the results to `table` in file order. A chunk that comes back
+    # short hit an entry the layout rejects; nothing after it is appended and
+    # the number of entries that were is returned.
+    stride = BULK_LAYOUTS[layout_name][0]
+    per_chunk = max(1, -(-count // (4 * (jobs or os.cpu_count() or 1))))
+    starts = range(0, count, per_chunk)
+    offsets = [offset + i * stride for i in starts]
+    counts = [min(per_chunk, count - i) for i in starts]
+    decoded = 0
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        results = pool.map(decode_chunk, [path] * len(offsets), offsets, counts,
+                           [layout_name] * len(offsets), [denominators] * len(offsets))
+        for chunk_offset, chunk_count, result in zip(offsets, counts, results):
+            if isinstance(result, list):
+                table.extend(result)
+                decoded += chunk_count
+                continue
+            pos, scale, quat, valid = result
+            table.extend_bulk(chunk_offset, stride, layout_name, pos, scale, quat, valid)
+            decoded += len(pos)
+            if len(pos) < chunk_count:
                 break
-        if not found:
-            current_offset += 4
-            
-if __name__ == "__main__":
-    ap = argparse.ArgumentParser()
-    ap.add_argument("file", nargs="?", default="test.map")
-    args = ap.parse_args()
-    if not os.path.isfile(args.file):
-        print(f"File not found: {args.file}")
-        sys.exit(1)
-    parse_lpmt_block(args.file)
+    return decoded
+
+def decode_into_table(table, data, offset, detected, path=None, jobs=1, tags=None, max_entries=None, denominators=None):
+    if detected and detected[0] in BULK_LAYOUTS:
+        layout_name = detected[0]
+        stride = BULK_LAYOUTS[layout_name][0]
+        count = 0
+        if jobs != 1 and path is not None:
+            count = block_entry_count(data, offset, stride, max_entries, tags)
+        if count >= PARALLEL_MIN_ENTRIES:
+            # fixed-point denominators are per block, not per chunk
+            denominators = denominators or fixed_point_denominators(data, offset, layout_name, count)
+            count = decode_block_parallel(table, path, offset, count, layout_name, jobs, denominators)
+        else:
+            bulk = decode_block_bulk(data, offset, layout_name, max_entries, tags, denominators)
+            count = 0
+            if bulk:
+                count, pos, scale, quat, valid = bulk
+                table.extend_bulk(offset, stride, layout_name, pos, scale, quat, valid)
+        if INSTRUMENT is not None:
+            INSTRUMENT.parsers[layout_name][5] += count
+        offset += count * stride
+        if max_entries is not None:
+            max_entries -= count
+    table.extend(decode_entries(data, offset, detected, tags, max_entries))
+    return table
+
+def read_lpmt_table(source, samples=DETECT_SAMPLES, jobs=1, cache=None, block=0):
+    # Decodes block number `block` of the directory into a TransformTable.
+    # jobs != 1 decodes large fixed-stride blocks across processes; that needs
+    # a path so the workers can map the file themselves.
+    data = open_source(source)
+    try:
+        blocks = find_lpmt_blocks(data)
+        if block >= len(blocks):
+            return TransformTable()
+        lpmt = blocks[block]
+        path = source if data is not source else None
+        with memoryview(data)[:lpmt.end] as view:
+            detected = detect_block_layout(view, lpmt.offset, samples, cache, header_stride(view, lpmt.offset))
+            return decode_into_table(TransformTable(lpmt.offset + 8), view, lpmt.offset + 8,
+                                     detected, path, jobs, max_entries=lpmt.entry_count or None)
+    finally:
+        if data is not source and isinstance(data, mmap.mmap):
+            data.close()
+
+class TransformTable:
+    # Columnar store for decoded entries: float32 pos/scale/quat columns,
+    # uint64 offsets relative to `base`, uint8 layout ids (index into PARSERS),
+    # uint8 valid flags and uint16 entry sizes. ~52 bytes per entry instead of
+    # a namedtuple holding three lists of boxed floats.
+    # column name and values per entry
+    WIDTHS = (('offset', 1), ('layout', 1), ('valid', 1), ('size', 1), ('pos', 3), ('scale', 3), ('quat', 4))
+
+    def __init__(self, base=0):
+        self.base = base
+        self.offset = array('Q')
+        self.layout = array('B')
+        self.valid = array('B')
+        self.size = array('H')
+        self.pos = array('f')
+        self.scale = array('f')
+        self.quat = array('f')
+
+    def __len__(self):
+        return len(self.offset)
+
+    def append(self, entry):
+        self.offset.append(entry.offset - self.base)
+        self.layout.append(LAYOUT_IDS[entry.layout])
+        self.valid.append(1 if entry.valid else 0)
+        self.size.append(entry.size)
+        self.pos.extend(entry.pos)
+        self.scale.extend(entry.scale)
+        self.quat.extend(entry.quat)
+
+    def extend(self, entries):
+        for entry in entries:
+            self.append(entry)
+
+    def extend_bulk(self, offset, stride, layout_name, pos, scale, quat, valid):
+        # numpy output of decode_block_bulk, appended without per-entry objects
+        count = len(pos)
+        rel = np.arange(count, dtype=np.uint64) * stride + (offset - self.base)
+        self.offset.frombytes(rel.astype('<u8').tobytes())
+        self.layout.frombytes(bytes([LAYOUT_IDS[layout_name]]) * count)
+        self.valid.frombytes(valid.astype('u1').tobytes())
+        self.size.frombytes(np.full(count, stride, dtype='<u2').tobytes())
+        self.pos.frombytes(pos.astype('<f4').tobytes())
+        self.scale.frombytes(scale.astype('<f4').tobytes())
+        self.quat.frombytes(quat.astype('<f4').tobytes())
+
+    def entry(self, i):
+        return LpmtEntry(self.base + self.offset[i], PARSERS[self.layout[i]][0],
+                         self.pos[i*3:i*3+3].tolist(), self.scale[i*3:i*3+3].tolist(),
+                         self.quat[i*4:i*4+4].tolist(), bool(self.valid[i]), self.size[i])
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return self.take(range(len(self))[idx])
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("TransformTable index out of range")
+        return self.entry(idx)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.entry(i)
+
+    def take(self, indices):
+        # rows at `indices` (ints or a boolean mask) as a new table; with
+        # numpy each column is gathered in one fancy-indexing pass
+        out = TransformTable(self.base)
+        if np is not None:
+            if not isinstance(indices, np.ndarray):
+                indices = np.fromiter(indices, dtype=np.int64)
+            for name, width in self.WIDTHS:
+                col = getattr(self, name)
+                rows = np.frombuffer(col, dtype=col.typecode)
+                if width > 1:
+                    rows = rows.reshape(-1, width)
+                getattr(out, name).frombytes(rows[indices].tobytes())
+            return out
+        for i in indices:
+            i = i + len(self) if i < 0 else i
+            out.offset.append(self.offset[i])
+            out.layout.append(self.layout[i])
+            out.valid.append(self.valid[i])
+            out.size.append(self.size[i])
+            out.pos.extend(self.pos[i*3:i*3+3])
+            out.scale.extend(self.scale[i*3:i*3+3])
+            out.quat.extend(self.quat[i*4:i*4+4])
+        return out
+
+    def filter(self, valid=True):
+        flag = 1 if valid else 0
+        if np is not None:
+            return self.take(np.frombuffer(self.valid, dtype=np.uint8) == flag)
+        return self.take(i for i, v in enumerate(self.valid) if v == flag)
+
+    def columns(self):
+        # numpy views over the float columns; offsets come back absolute
+        return {
+            'offset': np.frombuffer(self.offset, dtype=np.uint64) + self.base,
+            'layout': np.frombuffer(self.layout, dtype=np.uint8),
+            'valid': np.frombuffer(self.valid, dtype=np.uint8).astype(bool),
+            'size': np.frombuffer(self.size, dtype=np.uint16),
+            'pos': np.frombuffer(self.pos, dtype=np.float32).reshape(-1, 3),
+            'scale': np.frombuffer(self.scale, dtype=np.float32).reshape(-1, 3),
+            'quat': np.frombuffer(self.quat, dtype=np.float32).reshape(-1, 4),
+        }
+
+    def nbytes(self):
+        return sum(col.itemsize * len(col) for col in
+                   (self.offset, self.layout, self.valid, self.size, self.pos, self.scale, self.quat))
+
+def decode_entries(data, offset, detected=None, tags=None, max_entries=None):
+    # Yields LpmtEntry records from `offset` until the next FourCC tag or
+    # max_entries. The detected layout is tried first (in bulk when it has a
+    # vectorized form), anything it can't read falls back to probing the other
+    # layouts in ParserSchedule order.
+    layout_name = detected[0] if detected else None
+    bulk = decode_block_bulk(data, offset, layout_name, max_entries, tags) if detected else None
+    if bulk:
+        count, pos, scale, quat, valid = bulk
+        stride = BULK_LAYOUTS[layout_name][0]
+        if INSTRUMENT is not None:
+            INSTRUMENT.parsers[layout_name][5] += count
+        valid = valid.tolist()
+        pos, scale, quat = pos.tolist(), scale.tolist(), quat.tolist()
+        for i in range(count):
+            yield LpmtEntry(offset, layout_name, pos[i], scale[i], quat[i], valid[i], stride)
+            offset += stride
+        if max_entries is not None:
+            max_entries -= count
+
+    schedule = ParserSchedule(layout_name, prefilter=FloatPrefilter(data) if np is not None else None,
+                              first_parser=detected[1] if detected else None)
+    while offset < len(data) and max_entries != 0:
+        if fourcc_at(data, offset, tags):
+            break
+        probed = schedule.probe(data, offset)
+        if not probed:
+            if INSTRUMENT is not None:
+                INSTRUMENT.skipped += 4
+            offset += 4
+            continue
+        rank, name, (pos, scale, quat, size), valid = probed
+        if valid:
+            schedule.hit(rank)
+        yield LpmtEntry(offset, name, pos, scale, quat, valid, size)
+        offset += size
+        if max_entries is not None:
+            max_entries -= 1
+
+def open_source(source):
+    # source is a path or any buffer (bytes, mmap, memoryview)
+    return map_file(source) if isinstance(source, (str, os.PathLike)) else source
+
+def find_lpmt_blocks(data, index=None):
+    # Block directory: every LPMT tag in one forward pass (or straight from a
+    # FourCC index). A block's extent runs to the next LPMT tag or the end of
+    # the data; decoding stops earlier at entry_count or at a FourCC on an
+    # entry boundary.
+    if index is not None:
+        offsets = index.get('LPMT', [])
+    else:
+        offsets = []
+        pos = data.find(b'LPMT')
+        while pos != -1:
+            offsets.append(pos)
+            pos = data.find(b'LPMT', pos + 4)
+    blocks = []
+    for i, offset in enumerate(offsets):
+        if offset + 8 > len(data):
+            break
+        end = offsets[i + 1] if i + 1 < len(offsets) else len(data)
+        blocks.append(LpmtBlock(offset, struct.unpack_from('<I', data, offset + 4)[0], end))
+    return blocks
+
+def select_blocks(blocks, select=None):
+    if select is None:
+        return list(enumerate(blocks))
+    return [(i, blocks[i]) for i in select if 0 <= i < len(blocks)]
+
+def iter_lpmt_records(source, samples=DETECT_SAMPLES, cache=None, select=None):
+    # (block number, block, entry number, LpmtEntry) for every LPMT block, or
+    # only the block numbers in `select`; each block is detected and decoded
+    # only when the caller gets to it
+    data = open_source(source)
+    try:
+        for block_idx, block in select_blocks(find_lpmt_blocks(data), select):
+            with memoryview(data)[:block.end] as view:
+                detected = detect_block_layout(view, block.offset, samples, cache, header_stride(view, block.offset))
+                entries = decode_entries(view, block.offset + 8, detected, max_entries=block.entry_count or None)
+                for entry_idx, entry in enumerate(entries):
+                    yield block_idx, block, entry_idx, entry
+    finally:
+        if data is not source and isinstance(data, mmap.mmap):
+            data.close()
+
+def iter_lpmt_entries(source, samples=DETECT_SAMPLES, cache=None, select=None):
+    for _, _, _, entry in iter_lpmt_records(source, samples, cache, select):
+        yield entry
+
+def map_file(filename):
+    # read-only mapping: pages are faulted in on demand, so only the slices
+    # the decoder actually touches become resident
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+def iter_lpmt_tables(source, samples=DETECT_SAMPLES, cache=None, select=None, chunk=EXPORT_CHUNK, state=None):
+    # (block number, block, TransformTable) for every selected block, each
+    # table holding at most `chunk` entries, so exporters never see more than
+    # one chunk of a block at a time. With an IncrementalState, chunks whose
+    # bytes haven't changed since the last run come from it instead.
+    data = open_source(source)
+    try:
+        for block_idx, block in select_blocks(find_lpmt_blocks(data), select):
+            with memoryview(data)[:block.end] as view:
+                detected = detect_block_layout(view, block.offset, samples, cache, header_stride(view, block.offset))
+                offset = block.offset + 8
+                remaining = block.entry_count or None
+                layout_name = detected[0] if detected else None
+                # fixed-point layouts decode every chunk with the block's denominators
+                denominators = fixed_point_denominators(view, offset, layout_name, remaining)
+                while remaining != 0:
+                    limit = chunk if remaining is None else min(chunk, remaining)
+                    key = state.key(view, offset, limit, layout_name, denominators) if state is not None else None
+                    table = state.get(key, block.offset + 8) if key else None
+                    if table is None:
+                        table = decode_into_table(TransformTable(block.offset + 8), view, offset, detected,
+                                                  max_entries=limit, denominators=denominators)
+                    if key:
+                        state.put(key, table)
+                    if len(table):
+                        yield block_idx, block, table
+                    if len(table) < limit:
+                        break
+                    offset = table.base + table.offset[-1] + table.size[-1]
+                    if remaining is not None:
+                        remaining -= len(table)
+    finally:
+        if data is not source and isinstance(data, mmap.mmap):
+            data.close()
+
+class IncrementalState:
+    # Decoded chunks of the previous run over one file, for re-exporting it
+    # after small edits. A chunk is keyed by its offset, entry limit, layout,
+    # fixed-point denominators and a hash of the bytes it covers (`limit`
+    # entries at the layout's stride, or up to the block end). Only chunks
+    # that decoded as an unbroken run of the detected layout are kept: their
+    # rows depend on nothing but those bytes. Anything else (probed or
+    # resynced entries) may have read past its window and is always decoded
+    # again. Bulk layouts only; needs numpy.
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.rows = {}
+        self.chunks = {}
+        self.reused = 0
+        self.decoded = 0
+        self.load()
+
+    def load(self):
+        try:
+            with np.load(self.path) as f:
+                meta = json.loads(str(f['meta']))
+                valid, pos, scale, quat = f['valid'], f['pos'], f['scale'], f['quat']
+        except (OSError, ValueError, KeyError):
+            return
+        start = 0
+        for key, count in meta:
+            self.rows[tuple(tuple(k) if isinstance(k, list) else k for k in key)] = (
+                valid[start:start + count], pos[start:start + count],
+                scale[start:start + count], quat[start:start + count])
+            start += count
+
+    def key(self, data, offset, limit, layout_name, denominators):
+        if layout_name not in BULK_LAYOUTS:
+            return None
+        stride = BULK_LAYOUTS[layout_name][0]
+        end = min(len(data), offset + limit * stride)
+        digest = hashlib.blake2b(data[offset:end], digest_size=16).hexdigest()
+        return (offset, limit, end - offset, end == len(data), layout_name, denominators, digest)
+
+    def get(self, key, base):
+        rows = self.rows.get(key)
+        if rows is None:
+            return None
+        offset, layout_name = key[0], key[4]
+        table = TransformTable(base)
+        table.extend_bulk(offset, BULK_LAYOUTS[layout_name][0], layout_name, rows[1], rows[2], rows[3], rows[0])
+        self.reused += 1
+        return table
+
+    def put(self, key, table):
+        offset, limit, _, at_end, layout_name = key[:5]
+        if key in self.rows:
+            self.chunks[key] = self.rows[key]
+            return
+        self.decoded += 1
+        count = len(table)
+        if count < limit and not at_end:
+            # stopped early for a reason that may lie past the window
+            return
+        stride = BULK_LAYOUTS[layout_name][0]
+        cols = table.columns()
+        if not ((cols['offset'] == offset + np.arange(count, dtype=np.uint64) * stride).all()
+                and (cols['layout'] == LAYOUT_IDS[layout_name]).all()):
+            return
+        self.chunks[key] = (cols['valid'].copy(), cols['pos'].copy(), cols['scale'].copy(), cols['quat'].copy())
+
+    def save(self):
+        # only the chunks this run saw; unchanged runs leave the file alone
+        if not self.decoded and len(self.chunks) == len(self.rows):
+            return
+        meta = [[list(key), len(rows[0])] for key, rows in self.chunks.items()]
+        columns = [np.concatenate([rows[i] for rows in self.chunks.values()]) if self.chunks
+                   else np.zeros((0,) + shape, dtype)
+                   for i, (shape, dtype) in enumerate([((), bool), ((3,), '<f4'), ((3,), '<f4'), ((4,), '<f4')])]
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, meta=np.array(json.dumps(meta)), valid=columns[0], pos=columns[1],
+                         scale=columns[2], quat=columns[3])
+            os.replace(tmp, self.path)
+        except OSError:
+            pass
+
+def incremental_state_path(path, state_dir=None):
+    name = hashlib.blake2b(os.path.abspath(path).encode('utf-8'), digest_size=16).hexdigest()
+    return os.path.join(state_dir or os.path.join(default_cache_dir(), 'incremental'), name + '.npz')
+
+# exported columns: name, little-endian dtype, values per entry
+EXPORT_COLUMNS = [
+    ('offset', '<u8', 1),
+    ('block', '<u4', 1),
+    ('layout', 'u1', 1),
+    ('valid', 'u1', 1),
+    ('size', '<u2', 1),
+    ('pos', '<f4', 3),
+    ('scale', '<f4', 3),
+    ('quat', '<f4', 4),
+]
+
+class ColumnExport:
+    # Streams TransformTable chunks into one spool file per column next to the
+    # output, then assembles the final file with every column contiguous.
+    # Only the chunk being written is ever in memory.
+    def __init__(self, path, fmt='columns'):
+        if np is None:
+            raise RuntimeError("numpy is required for npz/columns export")
+        self.path = path
+        self.fmt = fmt
+        self.count = 0
+        spool_dir = os.path.dirname(os.path.abspath(path))
+        self.spool = {name: tempfile.TemporaryFile(dir=spool_dir) for name, _, _ in EXPORT_COLUMNS}
+
+    def write(self, block_idx, table):
+        cols = table.columns()
+        cols['block'] = np.full(len(table), block_idx, dtype='<u4')
+        for name, dtype, _ in EXPORT_COLUMNS:
+            self.spool[name].write(np.ascontiguousarray(cols[name], dtype=dtype).data)
+        self.count += len(table)
+
+    def shape(self, width):
+        return (self.count,) if width == 1 else (self.count, width)
+
+    def close(self):
+        try:
+            for f in self.spool.values():
+                f.seek(0)
+            if self.fmt == 'npz':
+                self.write_npz()
+            else:
+                self.write_columns()
+        finally:
+            for f in self.spool.values():
+                f.close()
+        return self.count
+
+    def write_npz(self):
+        # np.savez wants every array in memory; writing the .npy members by
+        # hand lets each column be copied straight from its spool file
+        layouts = np.array([name for name, _ in PARSERS])
+        with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for name, dtype, width in EXPORT_COLUMNS:
+                with zf.open(name + '.npy', 'w', force_zip64=True) as f:
+                    np.lib.format.write_array_header_1_0(f, {
+                        'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                        'fortran_order': False,
+                        'shape': self.shape(width),
+                    })
+                    shutil.copyfileobj(self.spool[name], f, 1 << 20)
+            with zf.open('layouts.npy', 'w') as f:
+                np.lib.format.write_array(f, layouts)
+
+    def write_columns(self):
+        # LPMTCOL1 magic, u32 header length, JSON header, then the columns.
+        # Column offsets count from the first 64-byte boundary after the
+        # header, and every column starts 64-byte aligned.
+        columns = {}
+        offset = 0
+        for name, dtype, width in EXPORT_COLUMNS:
+            columns[name] = {'dtype': dtype, 'shape': list(self.shape(width)), 'offset': offset}
+            offset += align(self.count * width * np.dtype(dtype).itemsize)
+        header = {'count': self.count, 'layouts': [name for name, _ in PARSERS], 'columns': columns}
+        text = json.dumps(header).encode()
+        start = align(len(COLUMNS_MAGIC) + 4 + len(text))
+        with open(self.path, 'wb') as out:
+            out.write(COLUMNS_MAGIC + struct.pack('<I', len(text)) + text)
+            for name, dtype, width in EXPORT_COLUMNS:
+                out.write(b'\0' * (start + columns[name]['offset'] - out.tell()))
+                shutil.copyfileobj(self.spool[name], out, 1 << 20)
+
+def align(n):
+    return -(-n // COLUMNS_ALIGN) * COLUMNS_ALIGN
+
+def load_columns(path):
+    # maps a columns export back in: every array is a read-only view of the
+    # mapping, nothing is parsed beyond the JSON header
+    data = map_file(path)
+    if data[:len(COLUMNS_MAGIC)] != COLUMNS_MAGIC:
+        raise ValueError(f"{path} is not an LPMT columns export")
+    size = struct.unpack_from('<I', data, len(COLUMNS_MAGIC))[0]
+    header = json.loads(data[len(COLUMNS_MAGIC) + 4:len(COLUMNS_MAGIC) + 4 + size])
+    start = align(len(COLUMNS_MAGIC) + 4 + size)
+    arrays = {}
+    for name, col in header['columns'].items():
+        count = math.prod(col['shape'])
+        arrays[name] = np.frombuffer(data, dtype=col['dtype'], count=count,
+                                     offset=start + col['offset']).reshape(col['shape'])
+    return arrays, header['layouts']
+
+def export_lpmt(source, path, fmt='columns', samples=DETECT_SAMPLES, cache=None, select=None, state=None):
+    # with an IncrementalState the blocks go in smaller chunks, so an edit
+    # only costs re-decoding the chunks around it
+    export = ColumnExport(path, fmt)
+    chunk = INCREMENTAL_CHUNK if state is not None else EXPORT_CHUNK
+    try:
+        for block_idx, _, table in iter_lpmt_tables(source, samples, cache, select, chunk, state):
+            export.write(block_idx, table)
+    except:
+        for f in export.spool.values():
+            f.close()
+        raise
+    count = export.close()
+    if state is not None:
+        state.save()
+    return count
+
+CSV_FIELDS = (['block', 'block_offset', 'entry', 'offset', 'layout', 'valid', 'size']
+              + [f'pos_{c}' for c in 'xyz'] + [f'scale_{c}' for c in 'xyz'] + [f'quat_{c}' for c in 'xyzw'])
+
+def export_text(source, out, fmt='jsonl', samples=DETECT_SAMPLES, cache=None, select=None):
+    # One record per entry with floats at full precision (repr round-trips),
+    # the block number/offset and the entry number/offset. Records are built
+    # with repr of the float lists rather than a per-field encoder and handed
+    # to `out` a chunk at a time.
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    rows = [','.join(CSV_FIELDS)] if fmt == 'csv' else []
+    count = 0
+    for block_idx, block, entry_idx, e in iter_lpmt_records(source, samples, cache, select):
+        if fmt == 'csv':
+            values = repr(e.pos + e.scale + e.quat)[1:-1].replace(' ', '')
+            rows.append(f"{block_idx},{block.offset},{entry_idx},{e.offset},{e.layout},{int(e.valid)},{e.size},{values}")
+        elif e.valid:
+            rows.append(f'{{"block":{block_idx},"block_offset":{block.offset},"entry":{entry_idx},'
+                        f'"offset":{e.offset},"layout":"{e.layout}","valid":true,"size":{e.size},'
+                        f'"pos":{e.pos!r},"scale":{e.scale!r},"quat":{e.quat!r}}}')
+        else:
+            # may hold nan/inf, which repr doesn't spell the way json does
+            rows.append(encode({'block': block_idx, 'block_offset': block.offset, 'entry': entry_idx,
+                                'offset': e.offset, 'layout': e.layout, 'valid': False, 'size': e.size,
+                                'pos': e.pos, 'scale': e.scale, 'quat': e.quat}))
+        count += 1
+        if len(rows) >= EXPORT_CHUNK:
+            out.write('\n'.join(rows) + '\n')
+            rows.clear()
+    if rows:
+        out.write('\n'.join(rows) + '\n')
+    return count
+
+def open_text_output(path=None):
+    # large block-buffered writer; stdout too, so redirected output isn't
+    # flushed line by line
+    if path:
+        return open(path, 'w', encoding='utf-8', newline='', buffering=TEXT_BUFFER)
+    raw = io.FileIO(sys.stdout.fileno(), 'w', closefd=False)
+    return io.TextIOWrapper(io.BufferedWriter(raw, TEXT_BUFFER), encoding='utf-8', newline='')
+
+def parse_lpmt_block(filename, samples=DETECT_SAMPLES, jobs=1, cache=None, select=None):
+    # The persisted FourCC index only pays off when a few blocks are picked
+    # out of a file (--block): it lets later runs find them without touching
+    # the rest of the mapping. A full report reads every block anyway, and
+    # building the index would regex-scan (and fault in) the whole file first.
+    data = map_file(filename)
+    try:
+        index = None
+        if cache and select is not None:
+            index = load_fourcc_index(filename, data, os.path.join(os.path.dirname(cache.path), 'fourcc'))
+        parse_lpmt_data(data, samples, filename, jobs, cache, index, select)
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+def parse_lpmt_data(data, samples=DETECT_SAMPLES, path=None, jobs=1, cache=None, index=None, select=None):
+    # with a FourCC index the LPMT search and every end-of-block check become
+    # lookups instead of byte scans
+    tags = fourcc_offsets(index) if index is not None else None
+    blocks = select_blocks(find_lpmt_blocks(data, index), select)
+    if not blocks:
+        print("LPMT block not found")
+        return
+    for _, block in blocks:
+        with memoryview(data)[:block.end] as view:
+            print_block(view, block, samples, path, jobs, cache, tags)
+
+def print_block(data, block, samples=DETECT_SAMPLES, path=None, jobs=1, cache=None, tags=None):
+    print(f"LPMT block found at 0x{block.offset:X}")
+    print(f"Header entry_count: {block.entry_count}")
+
+    base_offset = block.offset + 8
+    stride = header_stride(data, block.offset, tags)
+    detected = detect_block_layout(data, block.offset, samples, cache, stride)
+    # var_header and string_prefixed entries vary in size, so no stride can
+    # be checked against the header for them
+    layout_stride = LAYOUT_STRIDES.get(detected[0]) if detected else None
+    if stride:
+        print(f"Header stride: {stride} bytes")
+        if layout_stride and layout_stride != stride:
+            print(f"Header stride conflict: no {stride}-byte layout decodes, "
+                  f"detected {detected[0]} is {layout_stride} bytes per entry")
+    elif block.entry_count and (layout_stride or not detected):
+        print(f"Header entry_count mismatch: {block.entry_count} entries don't fit a known stride before the next tag")
+    if detected:
+        layout_name, _, score, decoded, _ = detected
+        print(f"Detected layout: {layout_name} (score {score:.2f} over {decoded} samples)")
+        denominators = fixed_point_denominators(data, base_offset, layout_name, block.entry_count or None, tags)
+        if denominators:
+            print(f"Fixed-point denominators: pos 1/{denominators[0]:g}, scale 1/{denominators[1]:g}")
+    print()
+
+    max_entries = block.entry_count or None
+    if jobs != 1 and path is not None:
+        entries = decode_into_table(TransformTable(base_offset), data, base_offset, detected, path, jobs, tags, max_entries)
+    else:
+        entries = decode_entries(data, base_offset, detected, tags, max_entries)
+    end_offset = base_offset
+    entry_idx = -1
+    for entry_idx, entry in enumerate(entries):
+        print_entry(entry_idx, entry)
+        end_offset = entry.offset + entry.size
+
+    if entry_idx + 1 == block.entry_count and not fourcc_at(data, end_offset, tags):
+        print(f"Reached entry_count {block.entry_count} at 0x{end_offset:X}, stopping LPMT parsing")
+        return
+    end_offset = next_fourcc(data, end_offset, 4, tags=tags)
+    if end_offset != -1:
+        print(f"Next FourCC tag at 0x{end_offset:X}, stopping LPMT parsing")
 
+def has_wildcards(pattern):
+    return any(c in pattern for c in '*?[')
+
+def expand_inputs(patterns, match="*.map"):
+    # plain files pass through, directories are walked for `match`, anything
+    # with wildcards goes through glob; order is stable and duplicates dropped
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, dirs, files in os.walk(pattern):
+                dirs.sort()
+                paths.extend(os.path.join(root, name) for name in sorted(files) if fnmatch.fnmatch(name, match))
+        elif has_wildcards(pattern):
+            paths.extend(p for p in sorted(glob.glob(pattern, recursive=True)) if os.path.isfile(p))
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+def batch_worker(path, samples=DETECT_SAMPLES, cache_path=None, select=None, stats=False, spool_dir=None):
+    # runs in a pool process; one bad file must not take the batch down.
+    # The text report is written to a file in `spool_dir` and only its name
+    # goes back to the parent, so a large report never crosses the process
+    # boundary. With stats the file's parser counters come back for the
+    # parent to merge.
+    out = tempfile.NamedTemporaryFile('w', dir=spool_dir, suffix='.txt', delete=False, encoding='utf-8')
+    if stats:
+        previous = enable_instrumentation().take()
+    try:
+        with out:
+            if not os.path.isfile(path):
+                raise FileNotFoundError(f"File not found: {path}")
+            cache = LayoutCache(cache_path) if cache_path else None
+            with redirect_stdout(out):
+                parse_lpmt_block(path, samples, cache=cache, select=select)
+            if cache:
+                cache.save()
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    counts = None
+    if stats:
+        # only this file's counts go back; the earlier ones are put back in
+        # place, since with -j 1 this runs in the parent that merges them
+        counts = INSTRUMENT.take()
+        INSTRUMENT.merge(previous)
+    return path, out.name, error, counts
+
+def print_batch_results(results):
+    failed = 0
+    for path, report, error, stats in results:
+        print(f"##### {path}")
+        if report:
+            sys.stdout.flush()
+            with open(report, 'r', encoding='utf-8') as f:
+                shutil.copyfileobj(f, sys.stdout, 1 << 20)
+            os.remove(report)
+        if error:
+            print(f"ERROR: {error}")
+            failed += 1
+        if stats:
+            enable_instrumentation().merge(stats)
+        print()
+    return failed
+
+def pool_results(paths, jobs, args):
+    # batch_worker results in input order, each as soon as every earlier one
+    # is in. A worker that dies (segfault, OOM kill) breaks the pool and
+    # every file still queued or running with it. Those files are run again;
+    # when more than one was lost they go through a single worker, which
+    # takes them in order, so the first one lost there is the one it died
+    # on. Only that file is reported as failed, the rest go back to the pool.
+    results = {}
+    cursor = 0
+    pending = list(paths)
+    workers = jobs
+    while pending:
+        lost = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(batch_worker, path, *args) for path in pending]
+            for path, future in zip(pending, futures):
+                try:
+                    results[path] = future.result()
+                except BrokenProcessPool:
+                    lost.append(path)
+                    continue
+                while cursor < len(paths) and paths[cursor] in results:
+                    yield results.pop(paths[cursor])
+                    cursor += 1
+        if len(lost) == 1 or (lost and workers == 1):
+            results[lost[0]] = (lost[0], None, "worker process died", None)
+            lost = lost[1:]
+            workers = jobs
+        elif lost:
+            workers = 1
+        while cursor < len(paths) and paths[cursor] in results:
+            yield results.pop(paths[cursor])
+            cursor += 1
+        pending = lost
+
+def run_batch(paths, jobs=None, samples=DETECT_SAMPLES, cache_path=None, select=None):
+    # results are merged in input order, whatever order the workers finish in
+    stats = INSTRUMENT is not None
+    with tempfile.TemporaryDirectory(prefix='fullparser-batch-') as spool_dir:
+        args = (samples, cache_path, select, stats, spool_dir)
+        if jobs == 1 or len(paths) == 1:
+            failed = print_batch_results(batch_worker(path, *args) for path in paths)
+        else:
+            failed = print_batch_results(pool_results(paths, jobs, args))
+    print(f"Batch done: {len(paths)} files, {failed} failed")
+    return failed
+
+def parse_var_header_12f(data, offset, header_size):
+    r00, r01, r02, tx, r10, r11, r12, ty, r20, r21, r22, tz = VAR_HEADER_12F.unpack_from(data, offset + header_size)
+    sx = math.sqrt(r00*r00 + r10*r10 + r20*r20)
+    sy = math.sqrt(r01*r01 + r11*r11 + r21*r21)
+    sz = math.sqrt(r02*r02 + r12*r12 + r22*r22)
+    if sx == 0 or sy == 0 or sz == 0:
+        return None
+    rot_matrix = [
+        r00/sx, r01/sy, r02/sz,
+        r10/sx, r11/sy, r12/sz,
+        r20/sx, r21/sy, r22/sz
+    ]
+    pos = [tx, ty, tz]
+    scale = [sx, sy, sz]
+    quat = quaternion_from_matrix(rot_matrix)
+    if validate_transform(pos, scale, quat):
+        return pos, scale, quat, header_size + 48
+    return None
 
 def try_parse_variable_header_12f(data, offset):
-    for header_size in [1, 2, 3, 4, 5, 6, 7, 8, 12, 16, 20, 24, 28, 32]:
+    for header_size in VAR_HEADER_SIZES:
         try:
-            values = struct.unpack_from(f'<{header_size}B12f', data, offset)
-            mv = values[header_size:]
-            r00, r01, r02, tx, r10, r11, r12, ty, r20, r21, r22, tz = mv
-            sx = math.sqrt(r00*r00 + r10*r10 + r20*r20)
-            sy = math.sqrt(r01*r01 + r11*r11 + r21*r21)
-            sz = math.sqrt(r02*r02 + r12*r12 + r22*r22)
-            if sx == 0 or sy == 0 or sz == 0:
-                continue
-            rot_matrix = [
-                r00/sx, r01/sy, r02/sz,
-                r10/sx, r11/sy, r12/sz,
-                r20/sx, r21/sy, r22/sz
-            ]
-            pos = [tx, ty, tz]
-            scale = [sx, sy, sz]
-            quat = quaternion_from_matrix(rot_matrix)
-            if validate_transform(pos, scale, quat):
-                return pos, scale, quat, header_size + 48
+            result = parse_var_header_12f(data, offset, header_size)
+            if result:
+                return result
         except:
             continue
     return None
-    
+
 def try_parse_pos_3f_quat_4h_scale_3f(data, offset):
     try:
         vals = struct.unpack_from('<3f4h3f', data, offset)
@@ -1054,7 +2142,11 @@ def try_parse_pos_3f_quat_4h_scale_3f(data, offset):
         scale = list(vals[7:10])
         quat = [qi[0]/32767.0, qi[1]/32767.0, qi[2]/32767.0, qi[3]/32767.0]
         ln = math.sqrt(quat[0]*quat[0] + quat[1]*quat[1] + quat[2]*quat[2] + quat[3]*quat[3])
-        if ln == 0:
+        # 16-bit quaternions are stored unit length to within quantization:
+        # the norm before renormalizing is held to validate_transform's bound
+        # for float quaternions, which tells 4h from 4H data (read the other
+        # way it is off by ~0.24 on average)
+        if abs(ln - 1.0) > 0.1:
             return None
         quat = [quat[0]/ln, quat[1]/ln, quat[2]/ln, quat[3]/ln]
         if validate_transform(pos, scale, quat):
@@ -1070,7 +2162,7 @@ def try_parse_pos_3f_quat_4H_scale_3f(data, offset):
         scale = list(vals[7:10])
         quat = [(qu[0]/65535.0)*2.0-1.0, (qu[1]/65535.0)*2.0-1.0, (qu[2]/65535.0)*2.0-1.0, (qu[3]/65535.0)*2.0-1.0]
         ln = math.sqrt(quat[0]*quat[0] + quat[1]*quat[1] + quat[2]*quat[2] + quat[3]*quat[3])
-        if ln == 0:
+        if abs(ln - 1.0) > 0.1:
             return None
         quat = [quat[0]/ln, quat[1]/ln, quat[2]/ln, quat[3]/ln]
         if validate_transform(pos, scale, quat):
@@ -1078,41 +2170,44 @@ def try_parse_pos_3f_quat_4H_scale_3f(data, offset):
     except:
         return None
 
+# fixed-point layouts: position integer type and the (pos, scale)
+# denominators the parsers try, in order
+FIXED_POINT = {
+    "fixed_i32+i16": ('<i4', (1000.0, 1024.0, 4096.0, 16384.0), (100.0, 256.0, 1000.0, 1024.0, 4096.0)),
+    "fixed_all_i16": ('<i2', (10.0, 50.0, 100.0, 256.0, 512.0, 1000.0, 1024.0, 4096.0), (10.0, 100.0, 256.0, 1000.0, 1024.0, 4096.0)),
+}
+
+def parse_fixed_point(values, spec, size):
+    # values is (x, y, z, qx, qy, qz, qw, sx, sy, sz); the quaternion doesn't
+    # depend on the denominators, so it's normalized (or rejected) once
+    x, y, z, qx, qy, qz, qw, sx, sy, sz = values
+    quat = [qx/32767.0, qy/32767.0, qz/32767.0, qw/32767.0]
+    ln = math.sqrt(quat[0]*quat[0] + quat[1]*quat[1] + quat[2]*quat[2] + quat[3]*quat[3])
+    if abs(ln - 1.0) > 0.1:
+        return None
+    qn = [quat[0]/ln, quat[1]/ln, quat[2]/ln, quat[3]/ln]
+    _, pos_denoms, scale_denoms = spec
+    for pd in pos_denoms:
+        pos = [x/pd, y/pd, z/pd]
+        for sd in scale_denoms:
+            scale = [max(1e-6, sx/sd), max(1e-6, sy/sd), max(1e-6, sz/sd)]
+            if validate_transform(pos, scale, qn):
+                return pos, scale, qn, size
+    return None
+
 def try_parse_fixed_pos_i32_quat_i16_scale_i16(data, offset):
     try:
-        x, y, z, qx, qy, qz, qw, sx, sy, sz = struct.unpack_from('<3i4h3h', data, offset)
-        for pd in (1000.0, 1024.0, 4096.0, 16384.0):
-            pos = [x/pd, y/pd, z/pd]
-            for sd in (100.0, 256.0, 1000.0, 1024.0, 4096.0):
-                scale = [max(1e-6, sx/sd), max(1e-6, sy/sd), max(1e-6, sz/sd)]
-                quat = [qx/32767.0, qy/32767.0, qz/32767.0, qw/32767.0]
-                ln = math.sqrt(quat[0]*quat[0] + quat[1]*quat[1] + quat[2]*quat[2] + quat[3]*quat[3])
-                if ln == 0:
-                    continue
-                qn = [quat[0]/ln, quat[1]/ln, quat[2]/ln, quat[3]/ln]
-                if validate_transform(pos, scale, qn):
-                    return pos, scale, qn, 12 + 8 + 6
+        values = struct.unpack_from('<3i4h3h', data, offset)
     except:
-        pass
-    return None
+        return None
+    return parse_fixed_point(values, FIXED_POINT["fixed_i32+i16"], 12 + 8 + 6)
 
 def try_parse_fixed_all_i16(data, offset):
     try:
-        px, py, pz, qx, qy, qz, qw, sx, sy, sz = struct.unpack_from('<3h4h3h', data, offset)
-        for pd in (10.0, 50.0, 100.0, 256.0, 512.0, 1000.0, 1024.0, 4096.0):
-            pos = [px/pd, py/pd, pz/pd]
-            for sd in (10.0, 100.0, 256.0, 1000.0, 1024.0, 4096.0):
-                scale = [max(1e-6, sx/sd), max(1e-6, sy/sd), max(1e-6, sz/sd)]
-                quat = [qx/32767.0, qy/32767.0, qz/32767.0, qw/32767.0]
-                ln = math.sqrt(quat[0]*quat[0] + quat[1]*quat[1] + quat[2]*quat[2] + quat[3]*quat[3])
-                if ln == 0:
-                    continue
-                qn = [quat[0]/ln, quat[1]/ln, quat[2]/ln, quat[3]/ln]
-                if validate_transform(pos, scale, qn):
-                    return pos, scale, qn, 20
+        values = struct.unpack_from('<3h4h3h', data, offset)
     except:
-        pass
-    return None
+        return None
+    return parse_fixed_point(values, FIXED_POINT["fixed_all_i16"], 20)
 
 def try_parse_1int_3f_4h_3f(data, offset):
     try:
@@ -1122,7 +2217,7 @@ def try_parse_1int_3f_4h_3f(data, offset):
         scale = list(vals[8:11])
         quat = [qi[0]/32767.0, qi[1]/32767.0, qi[2]/32767.0, qi[3]/32767.0]
         ln = math.sqrt(quat[0]*quat[0] + quat[1]*quat[1] + quat[2]*quat[2] + quat[3]*quat[3])
-        if ln == 0:
+        if abs(ln - 1.0) > 0.1:
             return None
         quat = [quat[0]/ln, quat[1]/ln, quat[2]/ln, quat[3]/ln]
         if validate_transform(pos, scale, quat):
@@ -1138,11 +2233,707 @@ def try_parse_2int_3f_4h_3f(data, offset):
         scale = list(vals[9:12])
         quat = [qi[0]/32767.0, qi[1]/32767.0, qi[2]/32767.0, qi[3]/32767.0]
         ln = math.sqrt(quat[0]*quat[0] + quat[1]*quat[1] + quat[2]*quat[2] + quat[3]*quat[3])
-        if ln == 0:
+        if abs(ln - 1.0) > 0.1:
             return None
         quat = [quat[0]/ln, quat[1]/ln, quat[2]/ln, quat[3]/ln]
         if validate_transform(pos, scale, quat):
             return pos, scale, quat, 40
     except:
         return None
-  
\ No newline at end of file
+
+
+# Detection order matters: ties in detect_layout go to the earlier entry.
+# A tuple is a declarative spec (prefix, body, transposed, stride) compiled
+# by compile_layout; a function is a hand-written try_parse_* decoder.
+LAYOUTS = [
+    ("4x4_matrix", ('', 'mat4x4', False, 64)),
+    ("3x4_matrix", ('', 'mat3x4', False, 48)),
+    ("pos_quat_scale", ('', 'pqs', False, 40)),
+    ("quat_pos_scale", ('', 'qps', False, 40)),
+    ("scale_pos_quat", ('', 'spq', False, 40)),
+    ("1int+16f", ('I', 'mat4x4', False, 68)),
+    ("2int+16f", ('II', 'mat4x4', False, 72)),
+    ("1int+12f", ('I', 'mat3x4', False, 52)),
+    ("2int+12f", ('II', 'mat3x4', False, 56)),
+    ("4byte_pad+16f", ('I', 'mat4x4', False, 68)),
+    ("8byte_pad+12f", ('II', 'mat3x4', False, 56)),
+    ("1short+16f", ('H', 'mat4x4', False, 66)),
+    ("2short+16f", ('HH', 'mat4x4', False, 68)),
+    ("1byte+16f", ('B', 'mat4x4', False, 65)),
+    ("4byte+16f", ('BBBB', 'mat4x4', False, 68)),
+    ("transposed_4x4", ('', 'mat4x4', True, 64)),
+    ("transposed_3x4", ('', 'mat3x4', True, 48)),
+    ("1int+10f", ('I', 'pqs', False, 44)),
+    ("2int+10f", ('II', 'pqs', False, 48)),
+    ("16byte_pad+16f", ('IIII', 'mat4x4', False, 80)),
+    ("12byte_pad+12f", ('III', 'mat3x4', False, 60)),
+    ("3int+16f", ('III', 'mat4x4', False, 76)),
+    ("4int+12f", ('IIII', 'mat3x4', False, 64)),
+    ("euler_angles", try_parse_euler_angles),
+    ("axis_angle", try_parse_axis_angle),
+    ("dual_quaternion", try_parse_dual_quaternion),
+    ("compact_quat", try_parse_compact_quat),
+    ("1int+3f+4f+3f", ('I', 'pqs', False, 44)),
+    ("2int+3f+4f+3f", ('II', 'pqs', False, 48)),
+    ("var_header+16f", try_parse_variable_header_16f),
+    ("var_header+12f", try_parse_variable_header_12f),
+    ("var_header+10f", try_parse_variable_header_10f),
+    ("row_3x3+pos+scale", ('', 'mat3x3', False, 60)),
+    ("col_3x3+pos+scale", ('', 'mat3x3', True, 60)),
+    ("split_matrix", ('', 'mat3x3', False, 60)),
+    ("packed_transform", ('', 'psq', False, 40)),
+    ("inverted_4x4", try_parse_inverted_4x4),
+    ("decomposed_trans", try_parse_decomposed_transform),
+    ("trs_with_pivot", try_parse_trs_with_pivot),
+    ("half_precision", try_parse_half_precision),
+    ("aligned_64", ('', 'mat4x4', False, 64)),
+    ("aligned_80", ('', 'mat4x4', False, 80)),
+    ("aligned_96", ('', 'mat4x4', False, 96)),
+    ("compressed_quat", try_parse_compressed_quat),
+    ("nested_structure", try_parse_nested_structure),
+    ("string_prefixed", try_parse_string_prefixed),
+    ("double_precision", ('', 'pqs_f64', False, 80)),
+    ("mixed_precision", ('', 'pqs_mixed', False, 52)),
+    ("bitpacked", try_parse_bitpacked),
+    ("morton_encoded", try_parse_morton_encoded),
+    ("pos+quat4h+scale", try_parse_pos_3f_quat_4h_scale_3f),
+    ("pos+quat4H+scale", try_parse_pos_3f_quat_4H_scale_3f),
+    ("fixed_i32+i16", try_parse_fixed_pos_i32_quat_i16_scale_i16),
+    ("fixed_all_i16", try_parse_fixed_all_i16),
+    ("1int+3f+4h+3f", try_parse_1int_3f_4h_3f),
+    ("2int+3f+4h+3f", try_parse_2int_3f_4h_3f)
+]
+
+PARSERS = [(name, spec if callable(spec) else compile_layout(*spec)) for name, spec in LAYOUTS]
+
+# layouts that decode almost any bytes as a valid transform: bitpacked fields
+# all go through lookup tables, fixed-point ones renormalize the quaternion
+# and search denominators until the transform validates
+FALLBACK_LAYOUTS = {"bitpacked", "fixed_i32+i16", "fixed_all_i16"}
+
+LAYOUT_IDS = {name: i for i, (name, _) in enumerate(PARSERS)}
+
+# entry sizes of the hand-written layouts; var_header_* and string_prefixed
+# vary per entry and have none
+FUNCTION_STRIDES = {
+    "euler_angles": 36, "axis_angle": 40, "dual_quaternion": 44, "compact_quat": 36,
+    "inverted_4x4": 64, "decomposed_trans": 52, "trs_with_pivot": 52, "half_precision": 40,
+    "compressed_quat": 36, "nested_structure": 52, "bitpacked": 8, "morton_encoded": 36,
+    "pos+quat4h+scale": 32, "pos+quat4H+scale": 32, "fixed_i32+i16": 26, "fixed_all_i16": 20,
+    "1int+3f+4h+3f": 36, "2int+3f+4h+3f": 40,
+}
+
+LAYOUT_STRIDES = {name: spec[3] if not callable(spec) else FUNCTION_STRIDES.get(name) for name, spec in LAYOUTS}
+
+# leading float32 words of each layout as (possible byte offsets, word
+# count), checked by the FloatPrefilter before a fallback probe; layouts that
+# start with ints, halves or doubles have none
+FUNCTION_FLOATS = {
+    "euler_angles": ((0,), 9), "axis_angle": ((0,), 10), "dual_quaternion": ((0,), 11),
+    "compact_quat": ((0,), 9), "var_header+16f": (VAR_HEADER_SIZES, 16),
+    "var_header+12f": (VAR_HEADER_SIZES, 12), "var_header+10f": (VAR_HEADER_SIZES, 10),
+    "inverted_4x4": ((0,), 16), "decomposed_trans": ((0,), 13), "trs_with_pivot": ((0,), 13),
+    "compressed_quat": ((0,), 3), "nested_structure": ((4,), 3), "morton_encoded": ((8,), 7),
+    "pos+quat4h+scale": ((0,), 3), "pos+quat4H+scale": ((0,), 3),
+    "1int+3f+4h+3f": ((4,), 3), "2int+3f+4h+3f": ((8,), 3),
+}
+
+def float_window(prefix, body, transposed, stride):
+    body_fmt = BODIES[body][0]
+    if not re.fullmatch(r'\d+f', body_fmt):
+        return None
+    return (struct.calcsize('<' + prefix),), int(body_fmt[:-1])
+
+# var_header layouts' body parsers, taking the header size
+VAR_HEADER_PARSERS = {
+    "var_header+16f": parse_var_header_16f,
+    "var_header+12f": parse_var_header_12f,
+    "var_header+10f": parse_var_header_10f,
+}
+
+FLOAT_WINDOWS = {name: FUNCTION_FLOATS.get(name) if callable(spec) else float_window(*spec) for name, spec in LAYOUTS}
+
+# stride -> layouts of that size, in detection order
+LAYOUT_FAMILIES = {}
+for name, parser_func in PARSERS:
+    if LAYOUT_STRIDES[name]:
+        LAYOUT_FAMILIES.setdefault(LAYOUT_STRIDES[name], []).append((name, parser_func))
+
+def bulk_spec(prefix, body, transposed, stride):
+    # (stride, header bytes, body kind, extra) as used by decode_block_bulk
+    header = struct.calcsize('<' + prefix)
+    if body in ('mat4x4', 'mat3x4', 'mat3x3'):
+        kind = {'mat4x4': ('4x4', 't4x4'), 'mat3x4': ('3x4', 't3x4'), 'mat3x3': ('r3x3', 'c3x3')}[body][transposed]
+        return stride, header, kind, None
+    return stride, header, 'pqs', (BODIES[body][2], '<f8' if body == 'pqs_f64' else '<f4')
+
+# bulk specs of the hand-written layouts that have a vectorized form: halves
+# read as a pqs body, 4h/4H quaternions through decode_quat16_bulk, fixed-point
+# bodies through decode_fixed_bulk, Morton keys and bitpacked words as uint64
+FUNCTION_BULK = {
+    "half_precision": (40, 0, 'pqs', ((0, 3, 7), '<f2')),
+    "pos+quat4h+scale": (32, 0, 'q16', '<i2'),
+    "pos+quat4H+scale": (32, 0, 'q16', '<u2'),
+    "1int+3f+4h+3f": (36, 4, 'q16', '<i2'),
+    "2int+3f+4h+3f": (40, 8, 'q16', '<i2'),
+    "fixed_i32+i16": (26, 0, 'fixed', FIXED_POINT["fixed_i32+i16"]),
+    "morton_encoded": (36, 0, 'morton', None),
+    "bitpacked": (8, 0, 'bitpacked', None),
+    "fixed_all_i16": (20, 0, 'fixed', FIXED_POINT["fixed_all_i16"]),
+}
+
+# fixed-stride layouts with a vectorized form; mixed-precision bodies have none
+BULK_LAYOUTS = {name: bulk_spec(*spec) for name, spec in LAYOUTS
+                if not callable(spec) and spec[1] != 'pqs_mixed'}
+BULK_LAYOUTS.update(FUNCTION_BULK)
+
+def diff_tables(old, new, epsilon=DIFF_EPSILON):
+    # Entry-index alignment of two decoded blocks: (added, removed, changed)
+    # index arrays, changed meaning any pos/scale/quat component moved by more
+    # than epsilon (or turned nan/finite). One vectorized pass per column.
+    a, b = old.columns(), new.columns()
+    n = min(len(old), len(new))
+    changed = np.zeros(n, dtype=bool)
+    for name in ('pos', 'scale', 'quat'):
+        before, after = a[name][:n].astype(np.float64), b[name][:n].astype(np.float64)
+        with np.errstate(invalid='ignore'):
+            changed |= (np.abs(after - before) > epsilon).any(axis=1)
+        changed |= (np.isnan(after) != np.isnan(before)).any(axis=1)
+    return np.arange(n, len(new)), np.arange(n, len(old)), np.flatnonzero(changed)
+
+def cell_keys(cells, origin, dims):
+    # (N, 3) int64 grid cells -> int64 keys. Row-major over the bounding box
+    # when it fits, so keys sort like cells and a fixed neighbour offset keeps
+    # sorted keys sorted; otherwise a multiplicative hash (collisions only add
+    # candidates, distances are always checked).
+    if dims is not None:
+        c = cells - origin
+        return (c[:, 0] * dims[1] + c[:, 1]) * dims[2] + c[:, 2]
+    c = cells.astype(np.uint64)
+    h = c[:, 0] * np.uint64(0x9E3779B97F4A7C15) ^ c[:, 1] * np.uint64(0xC2B2AE3D27D4EB4F) ^ c[:, 2] * np.uint64(0x165667B19E3779F9)
+    return h.view(np.int64)
+
+def grid_nearest(a, b, radius):
+    # Nearest neighbours within `radius` both ways: for every b row the index
+    # of and distance to the nearest a row, and the same for every a row
+    # towards b (-1 / inf if none, ties to the lower index)
+    fwd, fwd_d = nearest_within(b, a, radius)
+    back, back_d = nearest_within(a, b, radius)
+    return fwd, fwd_d, back, back_d
+
+def greedy_pairs(fwd, fwd_d, back, back_d):
+    # (a, b) index pairs out of every row's nearest neighbour, closest pairs
+    # first and each row used at most once. Always pairs every mutual nearest
+    # pair and then some: a chain whose neighbours only turn mutual one pair
+    # at a time is taken in one pass instead of one round per pair.
+    jb, ia = np.flatnonzero(fwd >= 0), np.flatnonzero(back >= 0)
+    cand_a, cand_b = np.r_[fwd[jb], ia], np.r_[jb, back[ia]]
+    order = np.lexsort((cand_a, cand_b, np.r_[fwd_d[jb], back_d[ia]]))
+    taken_a, taken_b = bytearray(len(back)), bytearray(len(fwd))
+    out_a, out_b = [], []
+    for x, y in zip(cand_a[order].tolist(), cand_b[order].tolist()):
+        if not taken_a[x] and not taken_b[y]:
+            taken_a[x] = taken_b[y] = 1
+            out_a.append(x)
+            out_b.append(y)
+    return np.array(out_a, dtype=np.int64), np.array(out_b, dtype=np.int64)
+
+def nearest_within(q, p, radius):
+    # For every q row the index of and distance to the nearest p row within
+    # `radius` (-1 / inf if none, ties to the lower index). p is bucketed in a
+    # grid and each of the 27 cells around the q rows is looked up for all of
+    # them at once. The first grid is fine enough that p's densest
+    # radius-sized cell splits into about DIFF_CELL_TARGET rows per cell; a
+    # query is settled by the first grid whose neighbourhood holds a row
+    # within one cell size (nothing closer can lie outside it), the rest go
+    # on to a grid twice as coarse, up to radius-sized cells. Candidate pairs
+    # are built DIFF_PAIR_CAP at a time, so a dense cluster costs time but
+    # never more memory than that.
+    best = np.full(len(q), -1, dtype=np.int64)
+    best_d = np.full(len(q), np.inf)
+    limit = radius * 2.0 ** 40
+    p_ok = np.flatnonzero((np.abs(p) < limit).all(axis=1))
+    todo = np.flatnonzero((np.abs(q) < limit).all(axis=1))
+    if not len(p_ok) or not len(todo):
+        return best, best_d
+    _, counts = np.unique(cell_keys(np.floor(p[p_ok] / radius).astype(np.int64), None, None), return_counts=True)
+    level = min(10, max(0, math.ceil(math.log2(counts.max() / DIFF_CELL_TARGET) / 3)))
+    while level >= 0 and len(todo):
+        cell = radius / 2.0 ** level
+        p_cells = np.floor(p[p_ok] / cell).astype(np.int64)
+        q_cells = np.floor(q[todo] / cell).astype(np.int64)
+        origin = np.minimum(p_cells.min(axis=0), q_cells.min(axis=0)) - 1
+        dims = np.maximum(p_cells.max(axis=0), q_cells.max(axis=0)) - origin + 2
+        if float(dims[0]) * float(dims[1]) * float(dims[2]) >= 2.0 ** 62:
+            dims = None
+        p_keys = cell_keys(p_cells, origin, dims)
+        order = np.argsort(p_keys, kind='stable')
+        p_idx, p_keys = p_ok[order], p_keys[order]
+        cells, starts, counts = np.unique(p_keys, return_index=True, return_counts=True)
+        order = np.argsort(cell_keys(q_cells, origin, dims), kind='stable')
+        q_idx, q_cells = todo[order], q_cells[order]
+        pp, qq = p[p_idx], q[q_idx]
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for dz in (-1, 0, 1):
+                    keys = cell_keys(q_cells + np.array([dx, dy, dz], dtype=np.int64), origin, dims)
+                    at = np.minimum(np.searchsorted(cells, keys), len(cells) - 1)
+                    n = np.where(cells[at] == keys, counts[at], 0)
+                    ends = np.cumsum(n)
+                    total = int(ends[-1])
+                    for lo in range(0, total, DIFF_PAIR_CAP):
+                        k = np.arange(lo, min(total, lo + DIFF_PAIR_CAP))
+                        qi = np.searchsorted(ends, k, side='right')
+                        pi = starts[at[qi]] + k - (ends[qi] - n[qi])
+                        d = np.sqrt(((pp[pi] - qq[qi]) ** 2).sum(axis=1))
+                        near = d <= radius
+                        qi, pi, d = qi[near], p_idx[pi[near]], d[near]
+                        if not len(qi):
+                            continue
+                        # pairs come grouped by query: nearest of each group,
+                        # then the lowest index among the equally near
+                        head = np.flatnonzero(np.r_[True, qi[1:] != qi[:-1]])
+                        nearest = np.minimum.reduceat(d, head)
+                        pi = np.where(d == nearest.repeat(np.diff(np.r_[head, len(qi)])), pi, len(p))
+                        qi, pi, d = q_idx[qi[head]], np.minimum.reduceat(pi, head), nearest
+                        better = (d < best_d[qi]) | ((d == best_d[qi]) & (pi < best[qi]))
+                        best[qi[better]] = pi[better]
+                        best_d[qi[better]] = d[better]
+        todo = todo[best_d[todo] >= cell]
+        level -= 1
+    return best, best_d
+
+def position_groups(pos):
+    # Rows with identical positions as one point each: (points, order,
+    # starts, counts) with the group members at order[start:start + count],
+    # in row order. nan rows never group.
+    order = np.lexsort((pos[:, 2], pos[:, 1], pos[:, 0]))
+    rows = pos[order]
+    new = np.r_[True, (rows[1:] != rows[:-1]).any(axis=1)] if len(rows) else np.zeros(0, dtype=bool)
+    starts = np.flatnonzero(new)
+    counts = np.diff(np.r_[starts, len(rows)])
+    return rows[starts], order, starts, counts
+
+def take_members(order, starts, used, groups, take):
+    # the next `take` members of each group, past the `used` already paired
+    total = int(take.sum())
+    first = np.repeat(starts[groups] + used[groups] - np.cumsum(take) + take, take)
+    return order[first + np.arange(total)]
+
+def match_positions(a, b, radius=DIFF_RADIUS):
+    # One-to-one pairs (a indices, b indices) within `radius`, sorted by b
+    # index. Identical positions on each side are merged into one point that
+    # pairs as many times as it has rows, members matched rank for rank (in
+    # row order), so duplicates at one spot cost one pass instead of one
+    # round each. Points at exactly the same position on both sides pair
+    # first; the rest pair in rounds of mutual nearest neighbours on what has
+    # rows left. After DIFF_MUTUAL_ROUNDS the rounds pair greedily by distance
+    # (greedy_pairs), so chains that only resolve one pair per mutual round
+    # can't make it quadratic.
+    pa, order_a, starts_a, left_a = position_groups(a)
+    pb, order_b, starts_b, left_b = position_groups(b)
+    used_a, used_b = np.zeros(len(pa), dtype=np.int64), np.zeros(len(pb), dtype=np.int64)
+    pairs_a, pairs_b = [], []
+
+    def pair(ga, gb):
+        take = np.minimum(left_a[ga], left_b[gb])
+        pairs_a.append(take_members(order_a, starts_a, used_a, ga, take))
+        pairs_b.append(take_members(order_b, starts_b, used_b, gb, take))
+        used_a[ga] += take
+        used_b[gb] += take
+        left_a[ga] -= take
+        left_b[gb] -= take
+
+    # exact matches: equal points sort next to each other, a's first
+    points = np.concatenate([pa, pb])
+    side = np.r_[np.zeros(len(pa), dtype=np.int64), np.ones(len(pb), dtype=np.int64)]
+    order = np.lexsort((side, points[:, 2], points[:, 1], points[:, 0]))
+    rows = points[order]
+    same = np.flatnonzero((rows[1:] == rows[:-1]).all(axis=1) & (side[order[1:]] != side[order[:-1]]))
+    pair(order[same], order[same + 1] - len(pa))
+
+    live_a, live_b = np.flatnonzero(left_a), np.flatnonzero(left_b)
+    rounds = 0
+    while len(live_a) and len(live_b):
+        fwd, fwd_d, back, back_d = grid_nearest(pa[live_a], pb[live_b], radius)
+        if rounds < DIFF_MUTUAL_ROUNDS:
+            j = np.flatnonzero(fwd >= 0)
+            j = j[back[fwd[j]] == j]
+            i = fwd[j]
+        else:
+            i, j = greedy_pairs(fwd, fwd_d, back, back_d)
+        if not len(j):
+            break
+        pair(live_a[i], live_b[j])
+        live_a, live_b = live_a[left_a[live_a] > 0], live_b[left_b[live_b] > 0]
+        rounds += 1
+    ia, ib = np.concatenate(pairs_a), np.concatenate(pairs_b)
+    order = np.argsort(ib, kind='stable')
+    return ia[order], ib[order]
+
+def transform_deltas(a, b, ia, ib):
+    # position distance, rotation angle (degrees, sign of the quaternion
+    # ignored) and largest scale component change for aligned rows
+    pa, pb = a['pos'][ia].astype(np.float64), b['pos'][ib].astype(np.float64)
+    qa, qb = a['quat'][ia].astype(np.float64), b['quat'][ib].astype(np.float64)
+    sa, sb = a['scale'][ia].astype(np.float64), b['scale'][ib].astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dpos = np.sqrt(((pb - pa) ** 2).sum(axis=1))
+        dot = np.abs((qa * qb).sum(axis=1)) / np.sqrt((qa * qa).sum(axis=1) * (qb * qb).sum(axis=1))
+        drot = np.degrees(2.0 * np.arccos(np.clip(dot, 0.0, 1.0)))
+        dscale = np.abs(sb - sa).max(axis=1) if len(ia) else np.zeros(0)
+    return dpos, drot, dscale
+
+def diff_blocks(old, new, by='index', radius=DIFF_RADIUS, pos_tol=DIFF_EPSILON, rot_tol=DIFF_ROT_TOL,
+                scale_tol=DIFF_EPSILON):
+    # Aligns two decoded blocks by entry index or by nearest position and
+    # returns (removed, added, (ia, ib, dpos, drot, dscale)) with only the
+    # aligned pairs whose deltas exceed a tolerance (nan on one side counts)
+    a, b = old.columns(), new.columns()
+    if by == 'position':
+        ia, ib = match_positions(a['pos'].astype(np.float64), b['pos'].astype(np.float64), radius)
+        removed = np.setdiff1d(np.arange(len(old)), ia)
+        added = np.setdiff1d(np.arange(len(new)), ib)
+    else:
+        n = min(len(old), len(new))
+        ia = ib = np.arange(n)
+        removed, added = np.arange(n, len(old)), np.arange(n, len(new))
+    dpos, drot, dscale = transform_deltas(a, b, ia, ib)
+    with np.errstate(invalid='ignore'):
+        changed = (dpos > pos_tol) | (drot > rot_tol) | (dscale > scale_tol)
+    for name in ('pos', 'scale', 'quat'):
+        changed |= (np.isnan(a[name][ia]) != np.isnan(b[name][ib])).any(axis=1)
+    keep = np.flatnonzero(changed)
+    return removed, added, (ia[keep], ib[keep], dpos[keep], drot[keep], dscale[keep])
+
+def diff_lpmt(path_a, path_b, out, by='index', radius=DIFF_RADIUS, pos_tol=DIFF_EPSILON, rot_tol=DIFF_ROT_TOL,
+              scale_tol=DIFF_EPSILON, samples=DETECT_SAMPLES, cache=None, select=None):
+    # JSONL records of what changed from file A to file B, blocks matched by
+    # number: 'removed' (in A only), 'added' (in B only) and 'moved' (aligned
+    # entries with position, rotation or scale deltas over the tolerances).
+    # Returns (aligned, moved, added, removed) counts.
+    blocks_a = snapshot_blocks(path_a, samples, cache)
+    blocks_b = snapshot_blocks(path_b, samples, cache)
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    empty = TransformTable()
+    totals = [0, 0, 0, 0]
+    indices = range(max(len(blocks_a), len(blocks_b)))
+    for block_idx in (indices if select is None else [i for i in select if i in indices]):
+        old = blocks_a[block_idx][2] if block_idx < len(blocks_a) else empty
+        new = blocks_b[block_idx][2] if block_idx < len(blocks_b) else empty
+        removed, added, (ia, ib, dpos, drot, dscale) = diff_blocks(old, new, by, radius, pos_tol, rot_tol, scale_tol)
+        totals[0] += len(old) - len(removed)
+        totals[1] += len(ia)
+        totals[2] += len(added)
+        totals[3] += len(removed)
+        records = []
+        for op, table, rows in (('removed', old, removed), ('added', new, added)):
+            for i in rows.tolist():
+                e = table.entry(i)
+                records.append(encode({'op': op, 'block': block_idx, 'entry': i, 'offset': e.offset, 'layout': e.layout,
+                                       'pos': e.pos, 'scale': e.scale, 'quat': e.quat}))
+        for i, j, dp, dr, ds in zip(ia.tolist(), ib.tolist(), dpos.tolist(), drot.tolist(), dscale.tolist()):
+            ea, eb = old.entry(i), new.entry(j)
+            records.append(encode({'op': 'moved', 'block': block_idx, 'entry_a': i, 'entry_b': j,
+                                   'offset_a': ea.offset, 'offset_b': eb.offset, 'layout': eb.layout,
+                                   'pos_a': ea.pos, 'pos_b': eb.pos, 'scale_a': ea.scale, 'scale_b': eb.scale,
+                                   'quat_a': ea.quat, 'quat_b': eb.quat,
+                                   'delta_pos': dp, 'delta_rot': dr, 'delta_scale': ds}))
+            if len(records) >= EXPORT_CHUNK:
+                out.write('\n'.join(records) + '\n')
+                records.clear()
+        if records:
+            out.write('\n'.join(records) + '\n')
+    return tuple(totals)
+
+def snapshot_blocks(path, samples=DETECT_SAMPLES, cache=None, previous=None):
+    # [(block, digest, TransformTable)] for every LPMT block of `path`; blocks
+    # whose offset and bytes match one in `previous` keep its table instead
+    # of being decoded again
+    reuse = {(block.offset, digest): table for block, digest, table in previous or []}
+    data = map_file(path)
+    try:
+        blocks = []
+        for block in find_lpmt_blocks(data):
+            with memoryview(data)[:block.end] as view:
+                digest = hashlib.blake2b(view[block.offset:], digest_size=16).hexdigest()
+                table = reuse.get((block.offset, digest))
+                if table is None:
+                    detected = detect_block_layout(view, block.offset, samples, cache, header_stride(view, block.offset))
+                    table = decode_into_table(TransformTable(block.offset + 8), view, block.offset + 8,
+                                              detected, max_entries=block.entry_count or None)
+            blocks.append((block, digest, table))
+        return blocks
+    finally:
+        if isinstance(data, mmap.mmap):
+            data.close()
+
+def diff_records(path, previous, current, epsilon=DIFF_EPSILON):
+    # JSONL diff records between two snapshot_blocks results of one file,
+    # blocks matched by number; blocks with unchanged bytes are skipped
+    records = []
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    empty = TransformTable()
+    for block_idx in range(max(len(previous), len(current))):
+        old = previous[block_idx] if block_idx < len(previous) else None
+        new = current[block_idx] if block_idx < len(current) else None
+        if old and new and old[1] == new[1] and old[0].offset == new[0].offset:
+            continue
+        old_table = old[2] if old else empty
+        new_table = new[2] if new else empty
+        added, removed, changed = diff_tables(old_table, new_table, epsilon)
+        for op, table, indices in (('removed', old_table, removed), ('added', new_table, added),
+                                   ('moved', new_table, changed)):
+            for i in indices.tolist():
+                e = table.entry(i)
+                record = {'op': op, 'path': path, 'block': block_idx, 'entry': i, 'offset': e.offset,
+                          'layout': e.layout, 'valid': e.valid, 'pos': e.pos, 'scale': e.scale, 'quat': e.quat}
+                if op == 'moved':
+                    o = old_table.entry(i)
+                    record.update(old_offset=o.offset, old_pos=o.pos, old_scale=o.scale, old_quat=o.quat)
+                records.append(encode(record))
+    return records
+
+class DirWatcher:
+    # Wakes the watch loop when something under `root` may have changed:
+    # inotify on Linux (through libc, nothing to install), a plain sleep for
+    # the poll interval anywhere else. The loop re-scans file stats either
+    # way, so a missed or coalesced event costs at most one interval.
+    IN_EVENTS = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200  # modify, close_write, moved from/to, create, delete
+
+    def __init__(self, root, poll=False):
+        self.root = root
+        self.fd = None
+        if poll:
+            return
+        try:
+            self.libc = ctypes.CDLL(None, use_errno=True)
+            fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError, TypeError):
+            return
+        if fd >= 0:
+            self.fd = fd
+            self.add_watches()
+
+    def add_watches(self):
+        # re-adding an existing watch is a no-op, so new subdirectories are
+        # picked up by walking again after every wake-up
+        for dirpath, dirs, _ in os.walk(self.root):
+            self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), self.IN_EVENTS)
+
+    def wait(self, timeout):
+        if self.fd is None:
+            time.sleep(timeout)
+            return
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if ready:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+            self.add_watches()
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+def scan_map_files(root, match="*.map"):
+    stats = {}
+    for path in expand_inputs([root], match):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stats[path] = (st.st_size, st.st_mtime_ns)
+    return stats
+
+def watch_lpmt(root, out, match="*.map", samples=DETECT_SAMPLES, cache=None, epsilon=DIFF_EPSILON,
+               interval=WATCH_INTERVAL, debounce=WATCH_DEBOUNCE, poll=False):
+    # Decodes every map file under `root` once as the baseline, then streams
+    # JSONL diffs as files change. A change is only decoded once the file's
+    # size and mtime have held still for `debounce` seconds, so a save that
+    # lands in several writes is read once, complete. Only blocks whose bytes
+    # changed are re-decoded. A deleted file is one 'deleted' record.
+    known = {}
+    for path, st in scan_map_files(root, match).items():
+        try:
+            known[path] = (st, snapshot_blocks(path, samples, cache))
+        except Exception:
+            known[path] = (st, [])
+    if cache:
+        cache.save()
+    pending = {}
+    watcher = DirWatcher(root, poll)
+    try:
+        while True:
+            watcher.wait(min(interval, debounce) if pending else interval)
+            now = time.monotonic()
+            current = scan_map_files(root, match)
+            for path in set(known) | set(current):
+                st = current.get(path)
+                if st == (known[path][0] if path in known else None):
+                    pending.pop(path, None)
+                elif path not in pending or pending[path][0] != st:
+                    pending[path] = (st, now)
+            records = []
+            for path, (st, since) in list(pending.items()):
+                if now - since < debounce:
+                    continue
+                del pending[path]
+                previous = known[path][1] if path in known else []
+                if st is None:
+                    known.pop(path, None)
+                    records.append(json.dumps({'op': 'deleted', 'path': path}, separators=(',', ':')))
+                    continue
+                try:
+                    snapshot = snapshot_blocks(path, samples, cache, previous)
+                except Exception as e:
+                    records.append(json.dumps({'op': 'error', 'path': path, 'error': str(e)}, separators=(',', ':')))
+                    continue
+                known[path] = (st, snapshot)
+                records.extend(diff_records(path, previous, snapshot, epsilon))
+            if cache:
+                cache.save()
+            if records:
+                out.write('\n'.join(records) + '\n')
+                out.flush()
+    finally:
+        watcher.close()
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("files", nargs="*", default=["test.map"], help="map files, directories or glob patterns")
+    ap.add_argument("--samples", type=int, default=DETECT_SAMPLES, help="entries scored per candidate layout")
+    ap.add_argument("-j", "--jobs", type=int, default=None,
+                    help="worker processes for batch mode (default: all cores); for a single file, decode large "
+                         "fixed-stride blocks across this many processes (off unless given, values come out as float32)")
+    ap.add_argument("--match", default="*.map", help="file pattern used when walking directories")
+    ap.add_argument("--no-cache", action="store_true", help="always re-detect layouts, skip the layout cache")
+    ap.add_argument("--cache-file", default=None, help="layout cache location (default: user cache dir)")
+    ap.add_argument("--fourcc", action="store_true", help="list every FourCC tag with its offset instead of decoding")
+    ap.add_argument("--block", type=int, action="append", default=None, help="decode only this LPMT block number (repeatable)")
+    ap.add_argument("-o", "--output", default=None, help="write decoded entries to this file instead of printing them")
+    ap.add_argument("--stats", nargs="?", const="table", choices=["table", "json"], default=None,
+                    help="count calls, hits, exceptions and time per parser and report them at exit (stderr)")
+    ap.add_argument("--stats-file", default=None, help="write the --stats report to this file instead")
+    ap.add_argument("--format", choices=["text", "jsonl", "csv", "npz", "columns"], default=None,
+                    help="output format (default: text, or from the --output extension)")
+    ap.add_argument("--watch", metavar="DIR", default=None,
+                    help="watch DIR for changed map files and stream JSONL diffs of their transforms (to --output or stdout)")
+    ap.add_argument("--epsilon", type=float, default=DIFF_EPSILON, help="smallest pos/scale/quat change --watch reports")
+    ap.add_argument("--interval", type=float, default=WATCH_INTERVAL, help="--watch poll interval in seconds")
+    ap.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE,
+                    help="seconds a changed file must stay unchanged before --watch decodes it")
+    ap.add_argument("--poll", action="store_true", help="make --watch poll even where inotify is available")
+    ap.add_argument("--diff", metavar="OTHER", default=None,
+                    help="compare the input file with OTHER and write JSONL records of moved/added/removed entries")
+    ap.add_argument("--align", choices=["index", "position"], default="index",
+                    help="--diff pairs entries by index within a block, or by nearest position")
+    ap.add_argument("--radius", type=float, default=DIFF_RADIUS, help="--align position: farthest an entry may move and still pair")
+    ap.add_argument("--pos-tol", type=float, default=DIFF_EPSILON, help="--diff: smallest position change reported")
+    ap.add_argument("--rot-tol", type=float, default=DIFF_ROT_TOL, help="--diff: smallest rotation change reported (degrees)")
+    ap.add_argument("--scale-tol", type=float, default=DIFF_EPSILON, help="--diff: smallest scale component change reported")
+    ap.add_argument("--incremental", action="store_true",
+                    help="keep per-chunk hashes and results, and only re-decode chunks that changed since the last export (npz/columns)")
+    ap.add_argument("--state-file", default=None, help="--incremental state location (default: user cache dir, per input file)")
+    args = ap.parse_args()
+    if args.stats or args.stats_file:
+        enable_instrumentation()
+        atexit.register(report_stats, args.stats or 'table', args.stats_file)
+    cache_path = None if args.no_cache else (args.cache_file or os.path.join(default_cache_dir(), 'layouts.json'))
+    if args.watch:
+        if not os.path.isdir(args.watch):
+            print(f"Not a directory: {args.watch}")
+            sys.exit(1)
+        if np is None:
+            print("--watch needs numpy")
+            sys.exit(1)
+        out = open_text_output(args.output)
+        try:
+            watch_lpmt(args.watch, out, args.match, args.samples, LayoutCache(cache_path) if cache_path else None,
+                       args.epsilon, args.interval, args.debounce, args.poll)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            out.close()
+        sys.exit(0)
+    if len(args.files) == 1 and not os.path.isdir(args.files[0]) and not has_wildcards(args.files[0]):
+        if not os.path.isfile(args.files[0]):
+            print(f"File not found: {args.files[0]}")
+            sys.exit(1)
+        if args.fourcc:
+            data = map_file(args.files[0])
+            index = load_fourcc_index(args.files[0], data, os.path.join(os.path.dirname(cache_path), 'fourcc')) if cache_path else build_fourcc_index(data)
+            print_fourcc_index(data, index)
+            sys.exit(0)
+        cache = LayoutCache(cache_path) if cache_path else None
+        if cache:
+            atexit.register(cache.save)
+        if args.diff:
+            if not os.path.isfile(args.diff):
+                print(f"File not found: {args.diff}")
+                sys.exit(1)
+            if np is None:
+                print("--diff needs numpy")
+                sys.exit(1)
+            sys.stdout.flush()
+            out = open_text_output(args.output)
+            try:
+                aligned, moved, added, removed = diff_lpmt(args.files[0], args.diff, out, args.align, args.radius,
+                                                           args.pos_tol, args.rot_tol, args.scale_tol,
+                                                           args.samples, cache, args.block)
+            finally:
+                out.close()
+            print(f"Diff: {aligned} aligned, {moved} moved, {added} added, {removed} removed",
+                  file=sys.stdout if args.output else sys.stderr)
+            sys.exit(0)
+        fmt = args.format
+        if fmt is None and args.output:
+            ext = os.path.splitext(args.output)[1].lower()
+            fmt = {'.npz': 'npz', '.jsonl': 'jsonl', '.csv': 'csv', '.txt': 'text'}.get(ext, 'columns')
+        if fmt in ('jsonl', 'csv'):
+            sys.stdout.flush()
+            out = open_text_output(args.output)
+            try:
+                count = export_text(args.files[0], out, fmt, args.samples, cache, args.block)
+            finally:
+                out.close()
+            if args.output:
+                print(f"Exported {count} entries to {args.output} ({fmt})")
+            sys.exit(0)
+        if fmt in ('npz', 'columns'):
+            if not args.output:
+                print(f"--format {fmt} needs --output")
+                sys.exit(1)
+            state = None
+            if args.incremental:
+                if np is None:
+                    print("--incremental needs numpy")
+                    sys.exit(1)
+                state = IncrementalState(args.state_file or incremental_state_path(
+                    args.files[0], os.path.join(os.path.dirname(cache_path), 'incremental') if cache_path else None))
+            count = export_lpmt(args.files[0], args.output, fmt, args.samples, cache, args.block, state)
+            print(f"Exported {count} entries to {args.output} ({fmt})")
+            if state is not None:
+                print(f"Incremental: {state.reused} chunks reused, {state.decoded} decoded")
+            sys.exit(0)
+        if args.incremental:
+            print("--incremental needs --format npz or columns")
+            sys.exit(1)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8', buffering=TEXT_BUFFER) as out, redirect_stdout(out):
+                parse_lpmt_block(args.files[0], args.samples, args.jobs or 1, cache, args.block)
+            sys.exit(0)
+        # the report streams entry by entry unless -j asks for parallel decoding
+        parse_lpmt_block(args.files[0], args.samples, args.jobs or 1, cache, args.block)
+    else:
+        if args.output or args.format not in (None, 'text') or args.incremental or args.diff:
+            print("--output, --format, --incremental and --diff take a single input file")
+            sys.exit(1)
+        paths = expand_inputs(args.files, args.match)
+        if not paths:
+            print("No input files matched")
+            sys.exit(1)
+        sys.exit(1 if run_batch(paths, args.jobs, args.samples, cache_path, args.block) else 0)
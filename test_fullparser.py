@@ -0,0 +1,459 @@
+# Tests over benchmark.py's synthetic LPMT files. Run with `python -m pytest`.
+import io, json, os, random, struct, subprocess, sys, threading, time
+
+import numpy as np
+import pytest
+
+import benchmark
+import fullparser
+
+ENTRIES = 200
+LAYOUT_NAMES = [name for name, _ in fullparser.LAYOUTS]
+
+# quantized layouts: max abs pos error, max abs scale error, max quaternion
+# 1 - |dot|; the rest hold float32 (or better) and use DEFAULT_TOLERANCE
+DEFAULT_TOLERANCE = (1e-4, 1e-5, 1e-6)
+
+TOLERANCES = {
+    "half_precision": (0.05, 1e-3, 1e-3),
+    "fixed_i32+i16": (1e-3, 5e-3, 1e-6),
+    "fixed_all_i16": (0.05, 0.05, 1e-6),
+}
+
+# the generator only stores part of the transform for these
+LOSSY = {"bitpacked", "morton_encoded"}
+
+def expected_transforms(layout, entries, seed=1):
+    # the transforms generate_lpmt encodes, redrawn the same way
+    rng = random.Random(seed)
+    out = []
+    for i in range(entries):
+        transform = benchmark.random_transform(rng)
+        while fullparser.is_fourcc(benchmark.encode_entry(layout, transform, i), 0):
+            transform = benchmark.random_transform(rng)
+        out.append(transform)
+    return out
+
+def write(tmp_path, layout, entries=ENTRIES, blocks=1, seed=1, name=None):
+    path = str(tmp_path / (name or 'test.map'))
+    benchmark.write_lpmt(path, layout, entries, blocks, seed)
+    return path
+
+def assert_tables_equal(a, b, atol=0.0):
+    ca, cb = a.columns(), b.columns()
+    assert len(a) == len(b)
+    for name in ('offset', 'layout', 'valid', 'size'):
+        np.testing.assert_array_equal(ca[name], cb[name])
+    for name in ('pos', 'scale', 'quat'):
+        np.testing.assert_allclose(ca[name], cb[name], rtol=0, atol=atol)
+
+@pytest.mark.parametrize('layout', LAYOUT_NAMES)
+def test_detection(layout):
+    data = benchmark.generate_lpmt(layout, ENTRIES)
+    block = fullparser.find_lpmt_blocks(data)[0]
+    with memoryview(data)[:block.end] as view:
+        detected = fullparser.detect_block_layout(view, block.offset, stride=fullparser.header_stride(view, block.offset))
+    assert benchmark.detection_status(layout, detected[0] if detected else None) != 'misdetected'
+
+ROUND_TRIP = [name for name in LAYOUT_NAMES if name not in benchmark.KNOWN_AMBIGUOUS and name not in LOSSY]
+
+@pytest.mark.parametrize('layout', ROUND_TRIP)
+def test_round_trip(tmp_path, layout):
+    table = fullparser.read_lpmt_table(write(tmp_path, layout))
+    assert len(table) == ENTRIES
+    cols = table.columns()
+    assert cols['valid'].all()
+    expected = expected_transforms(layout, ENTRIES)
+    pos_tol, scale_tol, quat_tol = TOLERANCES.get(layout, DEFAULT_TOLERANCE)
+    np.testing.assert_allclose(cols['pos'], [t[0] for t in expected], rtol=0, atol=pos_tol)
+    np.testing.assert_allclose(cols['scale'], [t[1] for t in expected], rtol=0, atol=scale_tol)
+    # q and -q are the same rotation
+    dot = np.abs((cols['quat'].astype(np.float64) * np.array([t[2] for t in expected])).sum(axis=1))
+    assert (1.0 - dot).max() <= quat_tol
+
+@pytest.mark.parametrize('layout', sorted(fullparser.VAR_HEADER_PARSERS))
+def test_var_header_period(layout):
+    # the learned header size, the entry size the body parser reports and the
+    # generator's entry size all agree
+    transforms = expected_transforms(layout, 4)
+    entries = [benchmark.encode_entry(layout, t, i) for i, t in enumerate(transforms)]
+    data = b''.join(entries)
+    header = fullparser.var_header_size(data, 0, layout)
+    assert header == 3
+    parse = fullparser.var_header_parser(layout, header)
+    offset = 0
+    for entry, (pos, scale, quat, euler) in zip(entries, transforms):
+        result = parse(data, offset)
+        assert result[3] == len(entry)
+        np.testing.assert_allclose(result[0], pos, rtol=0, atol=1e-4)
+        np.testing.assert_allclose(result[1], scale, rtol=0, atol=1e-5)
+        assert abs(np.dot(result[2], quat)) > 1 - 1e-6
+        offset += result[3]
+
+@pytest.mark.parametrize('layout', sorted(fullparser.BULK_LAYOUTS))
+def test_bulk_matches_scalar(tmp_path, layout, monkeypatch):
+    path = write(tmp_path, layout)
+    bulk = fullparser.read_lpmt_table(path)
+    monkeypatch.setattr(fullparser, 'BULK_LAYOUTS', {})
+    scalar = fullparser.read_lpmt_table(path)
+    assert len(bulk) == ENTRIES
+    assert_tables_equal(bulk, scalar, atol=1e-4)
+
+def block_tables(path, blocks):
+    return [fullparser.read_lpmt_table(path, block=i) for i in range(blocks)]
+
+@pytest.mark.parametrize('layout', ['pos_quat_scale', '4x4_matrix', 'euler_angles', 'fixed_i32+i16'])
+def test_columns_export(tmp_path, layout):
+    path = write(tmp_path, layout, blocks=3)
+    tables = block_tables(path, 3)
+    out = str(tmp_path / 'out.cols')
+    assert fullparser.export_lpmt(path, out) == 3 * ENTRIES
+    arrays, layouts = fullparser.load_columns(out)
+    assert layouts == LAYOUT_NAMES
+    np.testing.assert_array_equal(arrays['block'], np.repeat(np.arange(3), ENTRIES))
+    for i, table in enumerate(tables):
+        rows = arrays['block'] == i
+        cols = table.columns()
+        for name in ('offset', 'layout', 'valid', 'size', 'pos', 'scale', 'quat'):
+            np.testing.assert_array_equal(arrays[name][rows], cols[name])
+
+def test_npz_export(tmp_path):
+    path = write(tmp_path, 'pos_quat_scale', blocks=2)
+    tables = block_tables(path, 2)
+    out = str(tmp_path / 'out.npz')
+    assert fullparser.export_lpmt(path, out, fmt='npz') == 2 * ENTRIES
+    with np.load(out) as f:
+        for i, table in enumerate(tables):
+            rows = f['block'] == i
+            for name, values in table.columns().items():
+                np.testing.assert_array_equal(f[name][rows], values)
+        assert list(f['layouts']) == LAYOUT_NAMES
+
+def test_jsonl_export(tmp_path):
+    path = write(tmp_path, 'pos_quat_scale', blocks=2)
+    tables = block_tables(path, 2)
+    out = io.StringIO()
+    assert fullparser.export_text(path, out, 'jsonl') == 2 * ENTRIES
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert len(records) == 2 * ENTRIES
+    for r in records:
+        e = tables[r['block']].entry(r['entry'])
+        assert (r['offset'], r['layout'], r['valid'], r['size']) == (e.offset, e.layout, e.valid, e.size)
+        assert (r['pos'], r['scale'], r['quat']) == (e.pos, e.scale, e.quat)
+
+def move_entry(path, entry, pos, stride=40):
+    data = bytearray(open(path, 'rb').read())
+    offset = data.index(b'LPMT') + 8 + entry * stride
+    data[offset:offset + 12] = struct.pack('<3f', *pos)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def test_incremental_reuse(tmp_path, monkeypatch):
+    monkeypatch.setattr(fullparser, 'INCREMENTAL_CHUNK', 50)
+    path = write(tmp_path, 'pos_quat_scale', blocks=2)
+    state_path = str(tmp_path / 'state.npz')
+    first, second = str(tmp_path / 'first.cols'), str(tmp_path / 'second.cols')
+    state = fullparser.IncrementalState(state_path)
+    fullparser.export_lpmt(path, first, state=state)
+    assert (state.reused, state.decoded) == (0, 2 * ENTRIES // 50)
+
+    state = fullparser.IncrementalState(state_path)
+    fullparser.export_lpmt(path, second, state=state)
+    assert (state.reused, state.decoded) == (2 * ENTRIES // 50, 0)
+    with open(first, 'rb') as a, open(second, 'rb') as b:
+        assert a.read() == b.read()
+
+    # an edit in one entry only costs its chunk
+    move_entry(path, 120, (1.0, 2.0, 3.0))
+    state = fullparser.IncrementalState(state_path)
+    fullparser.export_lpmt(path, second, state=state)
+    assert (state.reused, state.decoded) == (2 * ENTRIES // 50 - 1, 1)
+    arrays, _ = fullparser.load_columns(second)
+    assert arrays['pos'][120].tolist() == [1.0, 2.0, 3.0]
+    fresh, _ = fullparser.load_columns(first)
+    np.testing.assert_array_equal(np.delete(arrays['pos'], 120, axis=0), np.delete(fresh['pos'], 120, axis=0))
+
+def test_diff_by_index(tmp_path):
+    a = write(tmp_path, 'pos_quat_scale', name='a.map')
+    b = write(tmp_path, 'pos_quat_scale', entries=ENTRIES + 5, name='b.map')
+    move_entry(b, 7, (1.0, 2.0, 3.0))
+    out = io.StringIO()
+    assert fullparser.diff_lpmt(a, b, out) == (ENTRIES, 1, 5, 0)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert sorted(r['entry'] for r in records if r['op'] == 'added') == list(range(ENTRIES, ENTRIES + 5))
+    moved = [r for r in records if r['op'] == 'moved']
+    assert len(moved) == 1 and moved[0]['entry_a'] == moved[0]['entry_b'] == 7
+    assert moved[0]['pos_b'] == [1.0, 2.0, 3.0]
+
+def test_diff_by_position(tmp_path):
+    # the same entries in reverse order align by position with nothing moved
+    a = write(tmp_path, 'pos_quat_scale', name='a.map')
+    data = open(a, 'rb').read()
+    start = data.index(b'LPMT') + 8
+    end = start + ENTRIES * 40
+    entries = [data[i:i + 40] for i in range(start, end, 40)]
+    b = str(tmp_path / 'b.map')
+    with open(b, 'wb') as f:
+        f.write(data[:start] + b''.join(reversed(entries)) + data[end:])
+    out = io.StringIO()
+    assert fullparser.diff_lpmt(a, b, out) == (ENTRIES, ENTRIES, 0, 0)
+    out = io.StringIO()
+    assert fullparser.diff_lpmt(a, b, out, by='position') == (ENTRIES, 0, 0, 0)
+    assert out.getvalue() == ''
+
+def test_match_positions_duplicates():
+    # identical positions pair rank for rank, exact matches before near ones
+    a = np.repeat([[1.0, 2.0, 3.0], [5.0, 5.0, 5.0]], [1000, 3], axis=0)
+    b = np.repeat([[5.0, 5.0, 5.2], [1.0, 2.0, 3.0], [1.0, 2.0, 3.5]], [2, 600, 600], axis=0)
+    ia, ib = fullparser.match_positions(a, b, 1.0)
+    np.testing.assert_array_equal(ib, np.r_[0:2, 2:1002])
+    np.testing.assert_array_equal(ia, np.r_[1000:1002, 0:600, 600:1000])
+
+def test_match_positions_dense():
+    # 20k points in one radius-sized cell, shuffled and jittered well below
+    # their spacing: every row finds its own counterpart
+    rng = np.random.default_rng(1)
+    a = rng.uniform(0.0, 0.9, (20000, 3))
+    perm = rng.permutation(len(a))
+    b = a[perm] + rng.normal(0.0, 1e-4, a.shape)
+    ia, ib = fullparser.match_positions(a, b, 1.0)
+    np.testing.assert_array_equal(ib, np.arange(len(b)))
+    np.testing.assert_array_equal(ia, perm)
+
+def test_match_positions_chain():
+    # a and b alternate along a line with gaps shrinking to the right, so only
+    # the rightmost pair is ever mutually nearest: one pair per mutual round
+    # would take minutes, the greedy rounds take it in one
+    n = 4000
+    x = np.r_[0.0, np.cumsum(0.9 - 0.5 * np.arange(2 * n - 1) / (2 * n))]
+    points = np.zeros((2 * n, 3))
+    points[:, 0] = x
+    start = time.perf_counter()
+    ia, ib = fullparser.match_positions(points[0::2], points[1::2], 1.0)
+    assert time.perf_counter() - start < 5.0
+    np.testing.assert_array_equal(ia, np.arange(n))
+    np.testing.assert_array_equal(ib, np.arange(n))
+
+def test_nearest_within_brute_force():
+    rng = np.random.default_rng(2)
+    q = rng.uniform(0.0, 3.0, (300, 3))
+    # a dense spot makes the search start on a finer grid
+    p = np.concatenate([rng.uniform(0.0, 3.0, (300, 3)), np.repeat([[1.5, 1.5, 1.5]], 200, axis=0)])
+    for radius in (0.2, 0.5, 1.0):
+        index, dist = fullparser.nearest_within(q, p, radius)
+        d = np.sqrt(((q[:, None, :] - p[None, :, :]) ** 2).sum(axis=2))
+        d[d > radius] = np.inf
+        np.testing.assert_array_equal(index, np.where(np.isinf(d.min(axis=1)), -1, d.argmin(axis=1)))
+        np.testing.assert_array_equal(dist, d.min(axis=1))
+
+def test_watch_records(tmp_path):
+    path = write(tmp_path, 'pos_quat_scale', blocks=2)
+    before = fullparser.snapshot_blocks(path)
+    same = fullparser.snapshot_blocks(path, previous=before)
+    assert all(new[2] is old[2] for old, new in zip(before, same))
+    assert fullparser.diff_records(path, before, same) == []
+
+    move_entry(path, 3, (1.0, 2.0, 3.0))
+    after = fullparser.snapshot_blocks(path, previous=before)
+    assert after[1][2] is before[1][2]
+    records = [json.loads(r) for r in fullparser.diff_records(path, before, after)]
+    assert [(r['op'], r['block'], r['entry']) for r in records] == [('moved', 0, 3)]
+    assert records[0]['pos'] == [1.0, 2.0, 3.0]
+    assert records[0]['old_pos'] == before[0][2].entry(3).pos
+
+def cli_stats(tmp_path, paths, *args):
+    # a fresh process: enable_instrumentation wraps the parser tables for good
+    stats = str(tmp_path / 'stats.json')
+    subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), 'fullparser.py'), *paths,
+                    '--no-cache', '--stats', 'json', '--stats-file', stats, *args],
+                   check=True, stdout=subprocess.DEVNULL)
+    with open(stats) as f:
+        return json.load(f)
+
+@pytest.mark.parametrize('layout, parsed, bulk', [('pos_quat_scale', 0, ENTRIES), ('var_header+12f', ENTRIES, 0)])
+def test_stats(tmp_path, layout, parsed, bulk):
+    counts = cli_stats(tmp_path, [write(tmp_path, layout)])['parsers'][layout]
+    # detection's sample calls come on top of the decoded entries
+    assert counts['bulk'] == bulk
+    assert counts['hits'] >= parsed
+
+def test_batch_stats_serial_and_pool(tmp_path):
+    # with -j 1 the files run in the parent, with -j 2 in workers; both must
+    # add up every file's counts, not report the last file's alone
+    paths = [write(tmp_path, layout, name=layout + '.map')
+             for layout in ('pos_quat_scale', 'var_header+12f', 'euler_angles')]
+    serial, pool = (cli_stats(tmp_path, paths, '-j', jobs) for jobs in ('1', '2'))
+    for snap in (serial, pool):
+        for counts in snap['parsers'].values():
+            del counts['seconds']
+    assert serial == pool
+    assert serial['parsers']['var_header+12f']['hits'] >= ENTRIES
+    assert serial['parsers']['pos_quat_scale']['bulk'] == ENTRIES
+
+BATCH_WORKER = fullparser.batch_worker
+
+def crashing_worker(path, *args):
+    # stands in for a worker that segfaults or gets OOM-killed on one file
+    if os.path.basename(path).startswith('crash'):
+        os._exit(9)
+    return BATCH_WORKER(path, *args)
+
+def test_batch_survives_worker_crash(tmp_path, monkeypatch, capsys):
+    paths = [write(tmp_path, 'pos_quat_scale', entries=5, name=name)
+             for name in ('a.map', 'crash.map', 'b.map', 'c.map')]
+    monkeypatch.setattr(fullparser, 'batch_worker', crashing_worker)
+    assert fullparser.run_batch(paths, jobs=2) == 1
+    out = capsys.readouterr().out
+    reports = out.split('##### ')[1:]
+    # every file reported once, in input order, only the crashing one failed
+    assert [r.splitlines()[0] for r in reports] == paths
+    assert [('ERROR: worker process died' in r) for r in reports] == [False, True, False, False]
+    assert all('Detected layout: pos_quat_scale' in r for r in reports if 'ERROR' not in r)
+
+def test_layout_cache_lru(tmp_path):
+    path = str(tmp_path / 'layouts.json')
+    cache = fullparser.LayoutCache(path, max_entries=3)
+    for key in 'abc':
+        cache.put(key, [key])
+    cache.save()
+    # the hit on a is replayed on the next save, so b is the one evicted
+    cache = fullparser.LayoutCache(path, max_entries=3)
+    assert cache.get('a') == ['a']
+    cache.put('d', ['d'])
+    cache.save()
+    assert list(fullparser.LayoutCache(path).entries) == ['c', 'a', 'd']
+
+def test_layout_cache_merges_writers(tmp_path):
+    # two caches loaded before either saved: the second save keeps the first's entries
+    path = str(tmp_path / 'layouts.json')
+    first, second = fullparser.LayoutCache(path), fullparser.LayoutCache(path)
+    first.put('a', ['a'])
+    second.put('b', ['b'])
+    first.save()
+    second.save()
+    assert fullparser.LayoutCache(path).entries == {'a': ['a'], 'b': ['b']}
+
+def test_layout_cache_save_waits_for_lock(tmp_path):
+    path = str(tmp_path / 'layouts.json')
+    cache = fullparser.LayoutCache(path)
+    cache.put('a', ['a'])
+    with fullparser.file_lock(path + '.lock'):
+        saver = threading.Thread(target=cache.save)
+        saver.start()
+        saver.join(0.3)
+        assert saver.is_alive() and not os.path.exists(path)
+    saver.join(5)
+    assert fullparser.LayoutCache(path).entries == {'a': ['a']}
+
+def print_block_header(capsys, layout, entry_count=None):
+    # print_block's lines before the first entry, optionally with the
+    # header's entry_count overwritten
+    data = bytearray(benchmark.generate_lpmt(layout, ENTRIES))
+    if entry_count is not None:
+        struct.pack_into('<I', data, data.index(b'LPMT') + 4, entry_count)
+    block = fullparser.find_lpmt_blocks(bytes(data))[0]
+    fullparser.print_block(bytes(data), block)
+    return capsys.readouterr().out.split('=====')[0]
+
+@pytest.mark.parametrize('layout', ['var_header+12f', 'string_prefixed'])
+def test_no_stride_mismatch_for_variable_layouts(capsys, layout):
+    out = print_block_header(capsys, layout)
+    assert 'Detected layout: ' + layout in out
+    assert 'mismatch' not in out and 'conflict' not in out
+
+def test_header_stride_mismatch(capsys):
+    assert 'entry_count mismatch' in print_block_header(capsys, 'pos_quat_scale', ENTRIES + 1)
+
+def test_header_stride_conflict(capsys):
+    # 250 entries of 32 bytes end on the NEXT tag, but only the 40-byte layout decodes
+    out = print_block_header(capsys, 'pos_quat_scale', ENTRIES * 40 // 32)
+    assert 'Header stride: 32 bytes' in out
+    assert 'Header stride conflict: no 32-byte layout decodes, detected pos_quat_scale is 40 bytes' in out
+
+def mixed_block(layouts, entries=ENTRIES):
+    # one LPMT block holding `entries` entries of each layout in turn, and
+    # the transforms they encode
+    body, transforms = b'', []
+    for seed, layout in enumerate(layouts, 1):
+        expected = expected_transforms(layout, entries, seed)
+        body += b''.join(benchmark.encode_entry(layout, t, i) for i, t in enumerate(expected))
+        transforms += expected
+    count = struct.pack('<I', len(transforms))
+    return b'HEAD' + struct.pack('<I', 8) + b'\0' * 8 + b'LPMT' + count + body + b'NEXT\0\0\0\0', transforms
+
+@pytest.mark.parametrize('first, second', [
+    ('pos_quat_scale', '4x4_matrix'), ('pos_quat_scale', 'dual_quaternion'),
+    ('pos_quat_scale', 'string_prefixed'), ('var_header+12f', '1short+16f')])
+def test_mixed_layout_block(first, second):
+    # detection pins the first layout; the second half must not decode as it
+    data, transforms = mixed_block([first, second])
+    cols = fullparser.read_lpmt_table(data).columns()
+    layouts = [LAYOUT_NAMES[i] for i in cols['layout']]
+    assert layouts == [first] * ENTRIES + [second] * ENTRIES
+    assert cols['valid'].all()
+    np.testing.assert_allclose(cols['pos'], [t[0] for t in transforms], rtol=0, atol=1e-4)
+
+@pytest.mark.parametrize('bulk', [True, False])
+def test_damaged_entry_keeps_layout(bulk, monkeypatch):
+    # a lone invalid entry is damage, not a layout switch: it keeps the
+    # block's layout and stride
+    data, _ = mixed_block(['pos_quat_scale'])
+    data = bytearray(data)
+    struct.pack_into('<f', data, data.index(b'LPMT') + 8 + 50 * 40 + 28, -1.0)
+    if not bulk:
+        monkeypatch.setattr(fullparser, 'BULK_LAYOUTS', {})
+    cols = fullparser.read_lpmt_table(bytes(data)).columns()
+    assert [LAYOUT_NAMES[i] for i in cols['layout']] == ['pos_quat_scale'] * ENTRIES
+    assert np.flatnonzero(~cols['valid']).tolist() == [50]
+
+@pytest.mark.parametrize('bulk', [True, False])
+@pytest.mark.parametrize('layout', ['pos+quat4h+scale', 'pos+quat4H+scale'])
+def test_quat16_round_trip(tmp_path, monkeypatch, layout, bulk):
+    # signed and unsigned 16-bit quaternions are told apart by detection and
+    # decode to the stored values, not just to some valid rotation
+    path = write(tmp_path, layout)
+    if not bulk:
+        monkeypatch.setattr(fullparser, 'BULK_LAYOUTS', {})
+    cols = fullparser.read_lpmt_table(path).columns()
+    assert set(cols['layout']) == {LAYOUT_NAMES.index(layout)}
+    expected = expected_transforms(layout, ENTRIES)
+    # one 16-bit step is 1/32767 (4h) or 2/65535 (4H), renormalizing keeps it that small
+    np.testing.assert_allclose(cols['quat'], [t[2] for t in expected], rtol=0, atol=1e-4)
+    np.testing.assert_allclose(cols['pos'], [t[0] for t in expected], rtol=0, atol=1e-4)
+
+class StopWatch(Exception):
+    pass
+
+def test_watch_stream(tmp_path, monkeypatch):
+    # watch_lpmt in a thread, polling; the test edits the directory once the
+    # baseline is in, then stops the loop from its next wait
+    a, b = write(tmp_path, 'pos_quat_scale', name='a.map'), write(tmp_path, 'pos_quat_scale', name='b.map')
+    watching, stop = threading.Event(), threading.Event()
+
+    class Watcher(fullparser.DirWatcher):
+        def wait(self, timeout):
+            watching.set()
+            if stop.is_set():
+                raise StopWatch()
+            super().wait(timeout)
+
+    monkeypatch.setattr(fullparser, 'DirWatcher', Watcher)
+    out = io.StringIO()
+    def watch():
+        with pytest.raises(StopWatch):
+            fullparser.watch_lpmt(str(tmp_path), out, interval=0.02, debounce=0.05, poll=True)
+    thread = threading.Thread(target=watch)
+    thread.start()
+    try:
+        assert watching.wait(10)
+        move_entry(a, 7, (1.0, 2.0, 3.0))
+        os.remove(b)
+        c = write(tmp_path, 'pos_quat_scale', entries=3, name='c.map')
+        deadline = time.monotonic() + 10
+        while out.getvalue().count('\n') < 5 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        stop.set()
+        thread.join(10)
+    records = sorted((r['path'], r['op'], r.get('entry')) for r in map(json.loads, out.getvalue().splitlines()))
+    assert records == [(a, 'moved', 7), (b, 'deleted', None), (c, 'added', 0), (c, 'added', 1), (c, 'added', 2)]